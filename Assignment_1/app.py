@@ -1,63 +1,580 @@
 import os
 import string
+import pickle
+import hashlib
+import hmac
+import multiprocessing
+import threading
+import queue
+import heapq
 import math
 from docx import Document
-from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from array import array
+from bisect import bisect_left
+from collections import defaultdict, Counter
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+
+try:
+    import numpy as np
+    from scipy.sparse import csr_matrix
+except ImportError:
+    np = None
+    csr_matrix = None
+
 app = Flask(__name__)
 CORS(app)
 
+# Width of one term id inside a packed phrase key, enough for vocabularies of up to 4 billion terms.
+PHRASE_ID_BITS = 32
+
+# Phrases seen fewer times than this are pruned from the suggestion terms.
+MIN_PHRASE_COUNT = 2
+
+# Bump whenever the layout of the pickled index changes, older snapshots are then rebuilt from the documents.
+SNAPSHOT_VERSION = 4
+
+# Below this many files to parse, starting worker processes costs more than it saves.
+PARALLEL_EXTRACTION_THRESHOLD = 16
+
+# Page of results a search endpoint returns when no limit is given, and the largest one it returns for one request.
+DEFAULT_PAGE_SIZE = 10
+MAX_PAGE_SIZE = 100
+
+# BM25 term frequency saturation of the combined search.
+BM25_K1 = 1.2
+
+# BM25F boost and length normalisation (b) of every field in the combined search.
+BM25F_FIELDS = {'title': (3.0, 0.5), 'author': (2.0, 0.5), 'content': (1.0, 0.75)}
+
+# Token the admin endpoints expect in the X-Admin-Token header, they are disabled when ADMIN_TOKEN is not set.
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+
+
+# Function to extract doc_data from specific docx file
+def extract_text_from_documents(file_path):
+    document = Document(file_path)
+    doc_data = {'title': "", 'author': "", "content": ""}
+
+    paragraphs = (p.text.strip() for p in document.paragraphs if p.text.strip())
+    for text in paragraphs:
+        if not doc_data['title']:
+            doc_data['title'] = text
+        elif text.startswith("Author:"):
+            doc_data['author'] = text[7:].strip()
+        else:
+            doc_data['content'] += f"{text}"
+
+    return doc_data
+
+
+# Process pool worker, kept at module level so it can be sent to the worker processes.
+# A broken file comes back as an error message instead of aborting the whole extraction.
+def extract_document(file_path):
+    try:
+        return extract_text_from_documents(file_path), None
+    except Exception as e:
+        return None, str(e)
+
+
+# Term dictionary with a character n-gram index, so substring lookups only
+# verify the terms sharing the rarest n-grams of the keyword instead of scanning the vocabulary.
+class TermDictionary:
+    def __init__(self, terms, gram_size=3):
+        self.gram_size = gram_size
+        self.terms = []
+        self.term_ids = {}
+        self.gram_index = defaultdict(list)
+
+        for term in terms:
+            self.add_term(term)
+
+    def grams(self, text, size):
+        return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+    # Every term is indexed by all of its 1 to gram_size character grams, so short keywords can be served too.
+    def add_term(self, term):
+        if term in self.term_ids:
+            return
+
+        term_id = len(self.terms)
+        self.terms.append(term)
+        self.term_ids[term] = term_id
+
+        for size in range(1, self.gram_size + 1):
+            for gram in self.grams(term, size):
+                self.gram_index[gram].append(term_id)
+
+    # A removed term leaves a None slot behind, so the ids stored in the gram postings stay valid
+    def remove_term(self, term):
+        term_id = self.term_ids.pop(term, None)
+        if term_id is not None:
+            self.terms[term_id] = None
+
+    # Function to return the terms containing the keyword, in the same order as the original vocabulary
+    def substring_matches(self, keyword):
+        if not keyword:
+            return [term for term in self.terms if term is not None]
+
+        size = min(self.gram_size, len(keyword))
+        postings = sorted((self.gram_index.get(gram, []) for gram in self.grams(keyword, size)), key=len)
+        if not postings[0]:
+            return []
+
+        candidates = set(postings[0])
+        for term_ids in postings[1:]:
+            candidates.intersection_update(term_ids)
+            if not candidates:
+                return []
+
+        matches = (self.terms[term_id] for term_id in sorted(candidates))
+        return [term for term in matches if term is not None and keyword in term]
+
+
+# Postings of one term: sorted doc ids and their term frequencies in two parallel typed arrays, about
+# 6 bytes per posting. Reads follow the dict interface ({doc_id: tf}) the scoring functions already use.
+class Postings:
+    __slots__ = ('doc_ids', 'tfs')
+
+    def __init__(self):
+        self.doc_ids = array('I')
+        self.tfs = array('H')
+
+    # Counts an occurrence while building, doc ids have to arrive in increasing order
+    def add(self, doc_id, count=1):
+        if self.doc_ids and self.doc_ids[-1] == doc_id:
+            self.set_tf(len(self.tfs) - 1, self.tfs[-1] + count)
+        else:
+            self.doc_ids.append(doc_id)
+            self.tfs.append(0)
+            self.set_tf(len(self.tfs) - 1, count)
+
+    # Widens the frequencies to 32 bits the first time one does not fit in 16
+    def set_tf(self, position, tf):
+        if tf > 0xFFFF and self.tfs.typecode == 'H':
+            self.tfs = array('I', self.tfs)
+        self.tfs[position] = tf
+
+    # Puts the postings of one document in place, used by the incremental updates
+    def insert(self, doc_id, tf):
+        position = bisect_left(self.doc_ids, doc_id)
+        if position == len(self.doc_ids) or self.doc_ids[position] != doc_id:
+            self.doc_ids.insert(position, doc_id)
+            self.tfs.insert(position, 0)
+        self.set_tf(position, tf)
+
+    def remove(self, doc_id):
+        position = self.find(doc_id)
+        if position >= 0:
+            del self.doc_ids[position]
+            del self.tfs[position]
+
+    def find(self, doc_id):
+        position = bisect_left(self.doc_ids, doc_id)
+        if position < len(self.doc_ids) and self.doc_ids[position] == doc_id:
+            return position
+        return -1
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    def __contains__(self, doc_id):
+        return self.find(doc_id) >= 0
+
+    def __getitem__(self, doc_id):
+        position = self.find(doc_id)
+        if position < 0:
+            raise KeyError(doc_id)
+        return self.tfs[position]
+
+    def get(self, doc_id, default=None):
+        position = self.find(doc_id)
+        return self.tfs[position] if position >= 0 else default
+
+    def keys(self):
+        return self.doc_ids
+
+    def values(self):
+        return self.tfs
+
+    def items(self):
+        return zip(self.doc_ids, self.tfs)
+
+    # On-disk form: (doc id gap, tf) pairs as LEB128 varints
+    def to_bytes(self):
+        data = bytearray()
+        previous = 0
+        for doc_id, tf in zip(self.doc_ids, self.tfs):
+            for value in (doc_id - previous, tf):
+                while value >= 0x80:
+                    data.append((value & 0x7F) | 0x80)
+                    value >>= 7
+                data.append(value)
+            previous = doc_id
+        return bytes(data)
+
+    @classmethod
+    def from_bytes(cls, data):
+        postings = cls()
+        values = []
+        value = shift = 0
+        for byte in data:
+            value |= (byte & 0x7F) << shift
+            if byte & 0x80:
+                shift += 7
+                continue
+            values.append(value)
+            value = shift = 0
+
+        doc_id = 0
+        for position in range(0, len(values), 2):
+            doc_id += values[position]
+            postings.doc_ids.append(doc_id)
+            postings.tfs.append(0)
+            postings.set_tf(len(postings.tfs) - 1, values[position + 1])
+        return postings
+
+
+# Document-at-a-time top-k retrieval with WAND pruning. Every query term comes as (postings, weight, upper_bound),
+# a document gets weight * tf / doc_norms[doc_id] from every term it contains and upper_bound is at least the
+# largest of those. Documents whose summed upper bounds cannot beat the current k-th best score are skipped
+# without being scored. Returns (doc_id, score) best first, ties by doc id.
+def wand_top_k(terms, doc_norms, k):
+    # Cursors are [position, doc ids, tfs, weight, upper bound], bounds below 0 count as 0
+    cursors = [[0, postings.doc_ids, postings.tfs, weight, max(bound, 0)] for postings, weight, bound in terms if len(postings)]
+    # Min-heap of (score, -doc_id), the worst document of the current top k on top
+    top = []
+
+    while cursors:
+        cursors.sort(key=lambda cursor: cursor[1][cursor[0]])
+        threshold = top[0][0] if len(top) == k else None
+
+        # The pivot is the first cursor at which the upper bounds add up to more than the threshold,
+        # no document before the pivot document can enter the top k
+        pivot = None
+        accumulated = 0
+        for position, cursor in enumerate(cursors):
+            accumulated += cursor[4]
+            if threshold is None or accumulated > threshold:
+                pivot = position
+                break
+        if pivot is None:
+            break
+
+        pivot_doc = cursors[pivot][1][cursors[pivot][0]]
+        if cursors[0][1][cursors[0][0]] == pivot_doc:
+            score = 0
+            for cursor in cursors:
+                if cursor[1][cursor[0]] != pivot_doc:
+                    break
+                score += cursor[3] * cursor[2][cursor[0]] / doc_norms[pivot_doc]
+                cursor[0] += 1
+
+            # Documents come in doc id order, so a later one tied with the k-th best stays out
+            if len(top) < k:
+                heapq.heappush(top, (score, -pivot_doc))
+            elif score > top[0][0]:
+                heapq.heapreplace(top, (score, -pivot_doc))
+        else:
+            for cursor in cursors[:pivot]:
+                cursor[0] = bisect_left(cursor[1], pivot_doc, cursor[0])
+
+        cursors = [cursor for cursor in cursors if cursor[0] < len(cursor[1])]
+
+    return [(-negative_doc_id, score) for score, negative_doc_id in sorted(top, reverse=True)]
+
+
+# Doc-term TF-IDF weights as a CSR matrix (one row per doc id, one column per term), so a query is scored
+# against every document with a single sparse mat-vec instead of a Python loop over the postings.
+class TfIdfMatrix:
+    # term_weights yields (term, doc ids, weights) for every term of the index
+    def __init__(self, term_weights, num_documents):
+        self.columns = {}
+        rows, columns, data = [np.zeros(0, dtype=np.int64)], [np.zeros(0, dtype=np.int64)], [np.zeros(0)]
+
+        for term, doc_ids, weights in term_weights:
+            column = self.columns.setdefault(term, len(self.columns))
+            rows.append(np.asarray(doc_ids, dtype=np.int64))
+            columns.append(np.full(len(doc_ids), column, dtype=np.int64))
+            data.append(np.asarray(weights, dtype=np.float64))
+
+        shape = (num_documents, len(self.columns))
+        self.matrix = csr_matrix((np.concatenate(data), (np.concatenate(rows), np.concatenate(columns))), shape=shape)
+        # Same structure with ones, a document that only matches terms weighted 0 is still a match
+        self.pattern = self.matrix.copy()
+        self.pattern.data = np.ones_like(self.pattern.data)
+
+    # Function to return (doc_id, score) of the matching documents, best first and ties by doc id,
+    # query_weights yields (term, weight) and repeated terms add up
+    def top_documents(self, query_weights, top_k=None):
+        query = np.zeros(len(self.columns))
+        matched = np.zeros(len(self.columns))
+        for term, weight in query_weights:
+            column = self.columns.get(term)
+            if column is not None:
+                query[column] += weight
+                matched[column] = 1
+
+        doc_ids = np.flatnonzero(self.pattern @ matched)
+        scores = (self.matrix @ query)[doc_ids]
+
+        if top_k is not None and top_k < len(doc_ids):
+            # Everything tied with the k-th best score survives, so the tie break below stays exact
+            kth = np.argpartition(-scores, top_k - 1)[top_k - 1]
+            keep = scores >= scores[kth]
+            doc_ids, scores = doc_ids[keep], scores[keep]
+
+        order = np.lexsort((doc_ids, -scores))[:top_k]
+        return [(int(doc_ids[i]), float(scores[i])) for i in order]
+
+
+# BM25F: the frequencies of a term in every field are length normalised per field and boosted, then BM25 saturates
+# their sum once per document. fields is a list of (index, field_lengths, average_length, boost, b), all keyed
+# by the same doc ids. Returns {doc_id: score}.
+def bm25f_scores(query_terms, fields, num_documents, k1=BM25_K1):
+    scores = defaultdict(float)
+
+    for term, query_count in Counter(query_terms).items():
+        weighted_tfs = defaultdict(float)
+        for index, field_lengths, average_length, boost, b in fields:
+            postings = index.get(term)
+            if not postings or not boost:
+                continue
+            for doc_id, tf in postings.items():
+                weighted_tfs[doc_id] += boost * tf / (1 - b + b * field_lengths[doc_id] / average_length)
+
+        # Documents containing the term in any field
+        doc_frequency = len(weighted_tfs)
+        idf = math.log(1 + (num_documents - doc_frequency + 0.5) / (doc_frequency + 0.5))
+        for doc_id, weighted_tf in weighted_tfs.items():
+            scores[doc_id] += query_count * idf * weighted_tf * (k1 + 1) / (k1 + weighted_tf)
+
+    return scores
+
+
+# Compressed prefix trie over the suggestion terms. Every node caches its top-k terms by frequency,
+# so a lookup only walks the prefix and returns the cached list instead of scanning the vocabulary.
+class SuggestionTrie:
+    def __init__(self, search_terms, top_k=10):
+        self.top_k = top_k
+        self.search_terms = search_terms
+        self.rank = {term: rank for rank, term in enumerate(search_terms)}
+        self.root = self.build_node(sorted(search_terms), 0, len(search_terms), 0)
+
+    def sort_key(self, term):
+        return (-self.search_terms[term], self.rank[term])
+
+    # Builds the node for the sorted terms[lo:hi], which all share their first `depth` characters
+    def build_node(self, terms, lo, hi, depth):
+        node = {'label': "", 'children': {}, 'top': [], 'term': None}
+        if lo >= hi:
+            return node
+
+        first, last = terms[lo], terms[hi - 1]
+        end = depth
+        while end < min(len(first), len(last)) and first[end] == last[end]:
+            end += 1
+        node['label'] = first[depth:end]
+
+        if len(first) == end:
+            node['term'] = first
+            lo += 1
+
+        while lo < hi:
+            char = terms[lo][end]
+            child_hi = lo + 1
+            while child_hi < hi and terms[child_hi][end] == char:
+                child_hi += 1
+            node['children'][char] = self.build_node(terms, lo, child_hi, end)
+            lo = child_hi
+
+        node['top'] = self.node_top(node)
+        return node
+
+    def node_top(self, node):
+        candidates = [node['term']] if node['term'] is not None else []
+        for child in node['children'].values():
+            candidates.extend(child['top'])
+        return sorted(candidates, key=self.sort_key)[:self.top_k]
+
+    # Function to bring the trie in line with the current counts of the given terms (a term missing from
+    # search_terms is removed). Only nodes on the paths of those terms are touched, each re-ranked once.
+    def update(self, terms):
+        for term in terms:
+            self.reshape(term)
+
+        touched = {}
+        for term in terms:
+            for depth, node in self.path(term):
+                touched[id(node)] = (depth, node)
+
+        # Deepest first, so every node is re-ranked from children that are already up to date
+        for _, node in sorted(touched.values(), key=lambda item: -item[0]):
+            node['top'] = self.node_top(node)
+
+    # Inserts or clears the terminal node of a term, splitting an edge when the term ends inside it
+    def reshape(self, term):
+        present = term in self.search_terms
+        if present and term not in self.rank:
+            self.rank[term] = len(self.rank)
+
+        node = self.root
+        position = 0
+
+        while True:
+            label = node['label']
+            common = 0
+            while common < len(label) and position + common < len(term) and label[common] == term[position + common]:
+                common += 1
+
+            if common < len(label):
+                if not present:
+                    return
+                # The lower half of the split keeps the children and the cached top terms
+                child = {'label': label[common:], 'children': node['children'], 'top': node['top'], 'term': node['term']}
+                node['label'] = label[:common]
+                node['children'] = {label[common]: child}
+                node['term'] = None
+
+            position += common
+            if position == len(term):
+                node['term'] = term if present else None
+                return
+
+            child = node['children'].get(term[position])
+            if child is None:
+                if not present:
+                    return
+                child = {'label': term[position:], 'children': {}, 'top': [], 'term': None}
+                node['children'][term[position]] = child
+
+            node = child
+
+    # Function to return the nodes whose subtree holds the term, with the prefix length each one ends at
+    def path(self, term):
+        nodes = []
+        node = self.root
+        position = 0
+
+        while node is not None and term.startswith(node['label'], position):
+            position += len(node['label'])
+            nodes.append((position, node))
+            if position >= len(term):
+                break
+            node = node['children'].get(term[position])
+
+        return nodes
+
+    # Function to return the most frequent terms starting with the prefix
+    def suggest(self, prefix, max_suggestions=5):
+        node = self.root
+        position = 0
+
+        while True:
+            label = node['label']
+            remaining = prefix[position:]
+            if remaining.startswith(label) or label.startswith(remaining):
+                position += len(label)
+            else:
+                return []
+
+            if position >= len(prefix):
+                return node['top'][:max_suggestions]
+
+            node = node['children'].get(prefix[position])
+            if node is None:
+                return []
+
+
 # The purpose of making this class is to 
 # maintains the state across requests and avoids re-initializing the documents and indexes.
 class SearchEngine:
-    def __init__(self, folder_path='Documents'):
+    def __init__(self, folder_path='Documents', snapshot_file='index_snapshot.pkl', extraction_workers=None, vectorized_scoring=None):
+        if vectorized_scoring and csr_matrix is None:
+            raise ImportError("vectorized scoring needs numpy and scipy")
+
         self.folder_path = folder_path
+        self.snapshot_file = snapshot_file
+        self.extraction_workers = extraction_workers
+        self.extraction_errors = {}
         self.extracted_documents = []
+        self.document_ids = {}
+        self.num_documents = 0
         self.doc_lengths = {}
-        self.content_idf = {}
-        self.content_tf_idf = {}
-        self.title_idf = {}
-        self.title_tf_idf = {}
-        self.author_idf = {}
-        self.author_tf_idf = {}
+        self.content_index = {}
+        self.title_index = {}
+        self.author_index = {}
+        self.content_terms = TermDictionary([])
+        self.title_terms = TermDictionary([])
+        self.author_terms = TermDictionary([])
+        # Words of every title and author, the BM25F field lengths next to doc_lengths
+        self.title_lengths = {}
+        self.author_lengths = {}
+        # Largest tf / doc length of every term, the WAND upper bounds of each index
+        self.content_bounds = {}
+        self.title_bounds = {}
+        self.author_bounds = {}
         self.search_terms = defaultdict(int)
+        self.suggestion_trie = SuggestionTrie({})
+        # None picks the NumPy/SciPy scoring whenever both are installed
+        self.vectorized_scoring = csr_matrix is not None if vectorized_scoring is None else vectorized_scoring
+        # TF-IDF matrices by id of the index they were built from, dropped whenever a document changes
+        self.tf_idf_matrices = {}
+        # Guards the indexes while documents are added or removed under live traffic
+        self.index_lock = threading.RLock()
         self.setup_search_engine()
 
-    # Function to extract doc_data from specific docx file
-    def extract_text_from_documents(self, file_path):
-        document = Document(file_path)
-        doc_data = {'title': "", 'author': "", "content": ""}
-
-        paragraphs = (p.text.strip() for p in document.paragraphs if p.text.strip())
-        for text in paragraphs:
-            if not doc_data['title']:
-                doc_data['title'] = text
-            elif text.startswith("Author:"):
-                doc_data['author'] = text[7:].strip()
-            else:
-                doc_data['content'] += f"{text}"
-
-        return doc_data
-
     # Function to extract all content from the Document folder
-    def document_extractor(self):
+    def document_extractor(self, cached_documents=None):
+        cached_documents = cached_documents or {}
         documents = []
 
-        for file_name in os.listdir(self.folder_path):
+        # Sorted, so doc ids do not depend on the order the filesystem lists the folder in
+        file_names = [
+            file_name for file_name in sorted(os.listdir(self.folder_path))
+            if os.path.isfile(os.path.join(self.folder_path, file_name)) and file_name.endswith('.docx')
+        ]
+        pending = [file_name for file_name in file_names if file_name not in cached_documents]
+        extracted = dict(zip(pending, self.extract_files([os.path.join(self.folder_path, file_name) for file_name in pending])))
+
+        self.extraction_errors = {}
+        for file_name in file_names:
             file_path = os.path.join(self.folder_path, file_name)
 
-            if not (os.path.isfile(file_path) and file_name.endswith('.docx')):
+            if file_name in cached_documents:
+                documents.append(cached_documents[file_name])
                 continue
 
-            doc_data = self.extract_text_from_documents(file_path)
-            doc_data['file_name'] = file_path
+            doc_data, error = extracted[file_name]
+            if error is not None:
+                print(f"Error: could not extract {file_path}: {error}")
+                self.extraction_errors[file_name] = error
+                continue
 
+            doc_data['file_name'] = file_path
             documents.append(doc_data)
 
         return documents
 
+    # Function to parse the given files in order, fanned out over a process pool when there are enough of them
+    def extract_files(self, file_paths):
+        workers = self.extraction_workers or os.cpu_count() or 1
+        if workers < 2 or len(file_paths) < PARALLEL_EXTRACTION_THRESHOLD:
+            return [extract_document(file_path) for file_path in file_paths]
+
+        # Spawned, not forked: the document watcher calls this from a background thread of a threaded server,
+        # and a child forked while another thread holds a lock can deadlock
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+            return list(executor.map(extract_document, file_paths, chunksize=max(1, len(file_paths) // (workers * 4))))
+
     def extract_fullContext_from_documents(self, documents):
         return [
             f"Title: {doc['title']}\nAuthor: {doc['author']}\nContent: {doc['content']}"
@@ -66,11 +583,11 @@ class SearchEngine:
     
     # After successfully, extracting text from docx file, this function will separate the title content. 
     def extract_titles_from_documents(self, documents):
-        return [doc['title'] for doc in documents if doc.get('title')]
+        return [doc['title'] for doc in documents]
 
     # Similarly, this function will separate the author content.
     def extract_author_from_documents(self, documents):
-        return [doc['author'] for doc in documents if doc.get('author')]
+        return [doc['author'] for doc in documents]
 
     def stem(self, word):
         suffixes = ['ing', 'es', 'ed', 'ly', 'er', 'ment', 'ness', 'ful', 'able', 'ible']
@@ -88,94 +605,584 @@ class SearchEngine:
 
     # Function which build inverted index where each unique term maps to the documents that contain it,
     # and it also calculate TF (Term Frequency) for each document, return search terms for suggestion purpose.
-    def build_index(self, documents):
-        index = defaultdict(lambda: {'doc_ids': [], 'tf': {}})
+    def build_index(self, documents, count_phrases=True):
+        index = defaultdict(Postings)
         doc_lengths = {}
-        search_terms = defaultdict(int)
+        term_ids = {}
+        phrase_counts = Counter()
 
         for doc_id, content in enumerate(documents):
             words = self.preprocess_text(content.lower())
             doc_lengths[doc_id] = len(words)
 
-            for i in range(len(words)):
-                word = words[i]
-                if doc_id not in index[word]['tf']:
-                    index[word]['tf'][doc_id] = 0
-                index[word]['tf'][doc_id] += 1
-                search_terms[word] += 1
-
-                for j in range(i + 1, min(i + 5, len(words) + 1)):
-                    phrase = " ".join(words[i:j])
-                    search_terms[phrase] += 1
+            for word in words:
+                index[word].add(doc_id)
 
-            index[word]['doc_ids'].append(doc_id)
+            if count_phrases:
+                self.count_phrases(words, term_ids, phrase_counts)
 
+        search_terms = self.build_search_terms(term_ids, phrase_counts)
         return index, doc_lengths, search_terms
 
-    def compute_idf(self, index, num_documents):
-        return {word: math.log(num_documents / (1 + len(data['doc_ids']))) for word, data in index.items()}
+    # Counts the 1 to 4 word phrases of a document under packed integer keys (one term id per PHRASE_ID_BITS),
+    # so no phrase string is built while counting.
+    def count_phrases(self, words, term_ids, phrase_counts):
+        ids = [term_ids.setdefault(word, len(term_ids) + 1) for word in words]
 
-    def compute_tf_idf(self, index, idf, doc_lengths):
-        return {
-            word: {doc_id: (tf / doc_lengths[doc_id]) * idf[word] for doc_id, tf in data['tf'].items()}
-            for word, data in index.items()
-        }
+        for i in range(len(ids)):
+            # Single words get counted once more on their own, which keeps them ahead of equally frequent phrases
+            phrase_counts[ids[i]] += 1
 
-    # Function to return the result according to the user query
-    def search_query(self, query, tf_idf, idf, doc_lengths, documents):
+            key = 0
+            for n in range(min(4, len(ids) - i)):
+                key |= ids[i + n] << (PHRASE_ID_BITS * n)
+                phrase_counts[key] += 1
+
+    # Function to prune the counted phrases and turn the survivors into search terms for suggestion purpose.
+    # Single words are always kept, phrases need min_count occurrences and at most max_phrases of them are kept.
+    def build_search_terms(self, term_ids, phrase_counts, min_count=MIN_PHRASE_COUNT, max_phrases=None):
+        words = [None] + list(term_ids)
+        mask = (1 << PHRASE_ID_BITS) - 1
+
+        phrases = [key for key, count in phrase_counts.items() if key > mask and count >= min_count]
+        if max_phrases is not None and len(phrases) > max_phrases:
+            phrases = set(heapq.nlargest(max_phrases, phrases, key=phrase_counts.get))
+        else:
+            phrases = set(phrases)
+
+        search_terms = defaultdict(int)
+        for key, count in phrase_counts.items():
+            if key > mask and key not in phrases:
+                continue
+
+            phrase = []
+            while key:
+                phrase.append(words[key & mask])
+                key >>= PHRASE_ID_BITS
+            search_terms[" ".join(phrase)] = count
+
+        return search_terms
+
+    # IDF is computed from the postings when a query needs it, so adding or removing a document
+    # does not have to rescore every term of the index.
+    def compute_idf(self, index, term):
+        data = index.get(term)
+        if data is None:
+            return 0
+        return math.log(self.num_documents / (1 + len(data)))
+
+    # Function to compute the largest tf / doc length of every term, times the IDF weights of a query
+    # it bounds what the term adds to a document score
+    def compute_term_bounds(self, index, doc_lengths):
+        return {term: max(tf / doc_lengths[doc_id] for doc_id, tf in postings.items()) for term, postings in index.items()}
+
+    # Function to build the TF-IDF matrix of an index, weights are the same as in search_query
+    def tf_idf_matrix(self, index, doc_lengths):
+        lengths = np.ones(len(self.extracted_documents))
+        for doc_id, length in doc_lengths.items():
+            lengths[doc_id] = length
+
+        term_weights = (
+            (term, postings.doc_ids, np.asarray(postings.tfs) / lengths[np.asarray(postings.doc_ids)] * self.compute_idf(index, term))
+            for term, postings in index.items()
+        )
+        return TfIdfMatrix(term_weights, len(self.extracted_documents))
+
+    # Function to rank the documents matching the query, (doc_id, score) best first and ties by doc id
+    def rank_documents(self, query, index, doc_lengths, term_dictionary, term_bounds, top_k=None):
         query_keywords = self.preprocess_text(query)
-        query_tf_idf = {keyword: idf.get(keyword, 0) for keyword in query_keywords}
+        query_tf_idf = {keyword: self.compute_idf(index, keyword) for keyword in query_keywords}
+        query_weights = [
+            (term, query_score)
+            for word, query_score in query_tf_idf.items()
+            for term in term_dictionary.substring_matches(word)
+        ]
+
+        if self.vectorized_scoring:
+            matrix = self.tf_idf_matrices.get(id(index))
+            if matrix is None:
+                matrix = self.tf_idf_matrices[id(index)] = self.tf_idf_matrix(index, doc_lengths)
+            return matrix.top_documents(query_weights, top_k)
+
+        if top_k is not None:
+            term_weights = defaultdict(float)
+            for term, query_score in query_weights:
+                term_weights[term] += query_score * self.compute_idf(index, term)
+            terms = [(index[term], weight, weight * term_bounds[term]) for term, weight in term_weights.items()]
+            return wand_top_k(terms, doc_lengths, top_k)
 
         matched_docs = defaultdict(float)
-        
-        for word, query_score in query_tf_idf.items():
-            for term in tf_idf:
-                if word in term.lower():
-                    for doc_id, doc_score in tf_idf[term].items():
-                        matched_docs[doc_id] += query_score * doc_score
+        for term, query_score in query_weights:
+            term_idf = self.compute_idf(index, term)
+            for doc_id, tf in index[term].items():
+                doc_score = (tf / doc_lengths[doc_id]) * term_idf
+                matched_docs[doc_id] += query_score * doc_score
+
+        return sorted(matched_docs.items(), key=lambda x: (-x[1], x[0]))
+
+    # Function to return the result according to the user query
+    # Only the requested page gets its snippets and result dicts built
+    def search_query(self, query, index, doc_lengths, documents, term_dictionary, term_bounds, offset=0, limit=None):
+        with self.index_lock:
+            top_k = offset + limit if limit is not None else None
+            ranked_docs = self.rank_documents(query, index, doc_lengths, term_dictionary, term_bounds, top_k)
+
+            result = []
+            for doc_id, _ in ranked_docs[offset:]:
+                doc = documents[doc_id]
+                snippet = f"{doc['content'][:180].rsplit(' ', 1)[0]}..." if len(doc['content']) > 100 else doc['content']
+                result.append({'title': doc['title'], 'author': doc['author'], 'snippet': snippet.replace("Abstract", ""), 'file_path': doc['file_name']})
+
+        return result
+
+    # Function to compute the number of indexed words of every document in one field, from its postings
+    def compute_field_lengths(self, index):
+        field_lengths = defaultdict(int)
+        for postings in index.values():
+            for doc_id, tf in postings.items():
+                field_lengths[doc_id] += tf
+        return dict(field_lengths)
+
+    # Function to rank the documents against the title, author and content indexes in one pass with BM25F.
+    # Terms match exactly, boosts overrides the default boost of the fields it names.
+    def search_bm25f(self, query, boosts=None, offset=0, limit=None):
+        boosts = boosts or {}
+        query_terms = self.preprocess_text(query)
+
+        with self.index_lock:
+            fields = []
+            for field, index, field_lengths in (
+                ('title', self.title_index, self.title_lengths),
+                ('author', self.author_index, self.author_lengths),
+                ('content', self.content_index, self.doc_lengths)
+            ):
+                boost, b = BM25F_FIELDS[field]
+                average_length = sum(field_lengths.values()) / max(self.num_documents, 1)
+                fields.append((index, field_lengths, average_length, boosts.get(field, boost), b))
 
-        ranked_docs = sorted(matched_docs.items(), key=lambda x: x[1], reverse=True)
+            scores = bm25f_scores(query_terms, fields, self.num_documents)
+            if limit is not None:
+                ranked_docs = heapq.nsmallest(offset + limit, scores.items(), key=lambda x: (-x[1], x[0]))
+            else:
+                ranked_docs = sorted(scores.items(), key=lambda x: (-x[1], x[0]))
 
-        result = []
-        for doc_id, _ in ranked_docs:
-            doc = documents[doc_id]
-            snippet = f"{doc['content'][:180].rsplit(' ', 1)[0]}..." if len(doc['content']) > 100 else doc['content']
-            result.append({'title': doc['title'], 'author': doc['author'], 'snippet': snippet.replace("Abstract", ""), 'file_path': doc['file_name']})
+            result = []
+            for doc_id, _ in ranked_docs[offset:]:
+                doc = self.extracted_documents[doc_id]
+                snippet = f"{doc['content'][:180].rsplit(' ', 1)[0]}..." if len(doc['content']) > 100 else doc['content']
+                result.append({'title': doc['title'], 'author': doc['author'], 'snippet': snippet.replace("Abstract", ""), 'file_path': doc['file_name']})
 
         return result
 
     # Function that will suggest user keyword for searching for their ease.
-    def get_suggestions(self, query, search_terms, max_suggestions=5):
+    def get_suggestions(self, query, max_suggestions=5):
         query = query.lower()
-        matches = (term for term in search_terms if term.startswith(query))
-        sorted_matches = sorted(matches, key=lambda term: -search_terms[term])
-        return sorted_matches[:max_suggestions]
+        with self.index_lock:
+            return self.suggestion_trie.suggest(query, max_suggestions)
 
-    # Initialize Function
-    def setup_search_engine(self):
-        self.extracted_documents = self.document_extractor()
+    # Function to index a .docx file of the Documents folder without rebuilding the whole index.
+    # A file that is already indexed gets its postings swapped in place and keeps its doc id.
+    def add_document(self, file_name):
+        return self.store_document(file_name, self.load_document(file_name))
+
+    def update_document(self, file_name):
+        return self.add_document(file_name)
+
+    def store_document(self, file_name, doc_data):
+        with self.index_lock:
+            doc_id = self.document_ids.get(file_name)
+            if doc_id is None:
+                doc_id = len(self.extracted_documents)
+                self.extracted_documents.append(doc_data)
+                self.document_ids[file_name] = doc_id
+                self.num_documents += 1
+            else:
+                self.unindex_document(doc_id, self.extracted_documents[doc_id])
+                self.extracted_documents[doc_id] = doc_data
+
+            self.index_document(doc_id, doc_data)
+            self.tf_idf_matrices.clear()
+
+        return doc_id
+
+    def remove_document(self, file_name):
+        with self.index_lock:
+            doc_id = self.document_ids.pop(file_name, None)
+            if doc_id is None:
+                raise KeyError(file_name)
 
-        extracted_fulltext = self.extract_fullContext_from_documents(self.extracted_documents)
-        extracted_titles = self.extract_titles_from_documents(self.extracted_documents)
-        extracted_authors = self.extract_author_from_documents(self.extracted_documents)
+            self.unindex_document(doc_id, self.extracted_documents[doc_id])
+            # The slot stays empty so no other doc id shifts, the next full build compacts the list
+            self.extracted_documents[doc_id] = None
+            self.num_documents -= 1
+            self.tf_idf_matrices.clear()
+
+        return doc_id
+
+    # Function to apply a batch of changed file names from the watcher. Files still on disk are parsed
+    # together over the extraction pool, the others are dropped from the index.
+    def apply_changes(self, file_names):
+        present = [
+            file_name for file_name in file_names
+            if file_name.endswith('.docx') and os.path.isfile(os.path.join(self.folder_path, file_name))
+        ]
+        parsed = self.extract_files([os.path.join(self.folder_path, file_name) for file_name in present])
+
+        for file_name in set(file_names) - set(present):
+            if file_name in self.document_ids:
+                self.remove_document(file_name)
+
+        for file_name, (doc_data, error) in zip(present, parsed):
+            file_path = os.path.join(self.folder_path, file_name)
+            if error is not None:
+                # Usually a file that is still being copied, its next change event retries it
+                print(f"Error: could not extract {file_path}: {error}")
+                self.extraction_errors[file_name] = error
+                continue
+
+            doc_data['file_name'] = file_path
+            self.extraction_errors.pop(file_name, None)
+            self.store_document(file_name, doc_data)
+
+    def load_document(self, file_name):
+        if os.path.basename(file_name) != file_name or not file_name.endswith('.docx'):
+            raise ValueError(f"{file_name} is not a .docx file name")
+
+        file_path = os.path.join(self.folder_path, file_name)
+        if not os.path.isfile(file_path):
+            raise FileNotFoundError(f"{file_path} does not exist")
+
+        doc_data = extract_text_from_documents(file_path)
+        doc_data['file_name'] = file_path
+        return doc_data
+
+    def index_document(self, doc_id, doc):
+        fulltext = self.extract_fullContext_from_documents([doc])
+        self.doc_lengths[doc_id] = len(self.preprocess_text(fulltext[0].lower()))
+        self.title_lengths[doc_id] = len(self.preprocess_text(doc['title'].lower()))
+        self.author_lengths[doc_id] = len(self.preprocess_text(doc['author'].lower()))
+
+        self.add_postings(self.content_index, self.content_terms, self.content_bounds, fulltext, doc_id)
+        self.add_postings(self.title_index, self.title_terms, self.title_bounds, self.extract_titles_from_documents([doc]), doc_id)
+        self.add_postings(self.author_index, self.author_terms, self.author_bounds, self.extract_author_from_documents([doc]), doc_id)
+        self.update_search_terms(fulltext[0], 1)
+
+    def unindex_document(self, doc_id, doc):
+        fulltext = self.extract_fullContext_from_documents([doc])
+
+        self.remove_postings(self.content_index, self.content_terms, self.content_bounds, fulltext, doc_id)
+        self.remove_postings(self.title_index, self.title_terms, self.title_bounds, self.extract_titles_from_documents([doc]), doc_id)
+        self.remove_postings(self.author_index, self.author_terms, self.author_bounds, self.extract_author_from_documents([doc]), doc_id)
+        self.update_search_terms(fulltext[0], -1)
+        self.doc_lengths.pop(doc_id, None)
+        self.title_lengths.pop(doc_id, None)
+        self.author_lengths.pop(doc_id, None)
+
+    # The postings of a single document come from build_index, so they follow the same rules as a full build
+    def add_postings(self, index, term_dictionary, term_bounds, texts, doc_id):
+        postings, _, _ = self.build_index(texts, count_phrases=False)
+
+        for term, data in postings.items():
+            index.setdefault(term, Postings()).insert(doc_id, data[0])
+            term_dictionary.add_term(term)
+            term_bounds[term] = max(term_bounds.get(term, 0), data[0] / self.doc_lengths[doc_id])
+
+    # A bound left behind by a removed document only gets looser, it stays a valid upper bound
+    def remove_postings(self, index, term_dictionary, term_bounds, texts, doc_id):
+        postings, _, _ = self.build_index(texts, count_phrases=False)
+
+        for term in postings:
+            entry = index.get(term)
+            if entry is None:
+                continue
+
+            entry.remove(doc_id)
+            if not entry:
+                del index[term]
+                term_dictionary.remove_term(term)
+                term_bounds.pop(term, None)
+
+    # Function to add (sign 1) or take back (sign -1) the suggestion counts of one document
+    def update_search_terms(self, fulltext, sign):
+        term_ids = {}
+        phrase_counts = Counter()
+        self.count_phrases(self.preprocess_text(fulltext.lower()), term_ids, phrase_counts)
+
+        changed_terms = []
+        for term, count in self.build_search_terms(term_ids, phrase_counts, min_count=1).items():
+            if sign < 0:
+                if term not in self.search_terms:
+                    continue
+                self.search_terms[term] -= count
+                if self.search_terms[term] <= 0:
+                    del self.search_terms[term]
+            else:
+                # Phrases pruned by the last full build only come back once a single document repeats them enough
+                if term not in self.search_terms and " " in term and count < MIN_PHRASE_COUNT:
+                    continue
+                self.search_terms[term] += count
+
+            changed_terms.append(term)
+
+        self.suggestion_trie.update(changed_terms)
+
+    # Builds every index from the extracted documents, in the shape stored in the snapshot
+    def build_search_index(self, documents):
+        extracted_fulltext = self.extract_fullContext_from_documents(documents)
+        extracted_titles = self.extract_titles_from_documents(documents)
+        extracted_authors = self.extract_author_from_documents(documents)
 
         content_index, doc_lengths, search_terms = self.build_index(extracted_fulltext)
-        title_index, _, _ = self.build_index(extracted_titles)
-        author_index, _, _ = self.build_index(extracted_authors)
+        title_index, _, _ = self.build_index(extracted_titles, count_phrases=False)
+        author_index, _, _ = self.build_index(extracted_authors, count_phrases=False)
 
-        num_documents = len(self.extracted_documents)
+        return {
+            'extracted_documents': documents,
+            'doc_lengths': doc_lengths,
+            'content_index': dict(content_index),
+            'title_index': dict(title_index),
+            'author_index': dict(author_index),
+            'search_terms': search_terms
+        }
 
-        self.content_idf = self.compute_idf(content_index, num_documents)
-        self.author_idf = self.compute_idf(author_index, num_documents)
-        self.title_idf = self.compute_idf(title_index, num_documents)
+    # The snapshot keeps postings in their delta + varint byte form
+    def encode_snapshot_index(self, index):
+        encoded = dict(index)
+        for field in ('content_index', 'title_index', 'author_index'):
+            encoded[field] = {term: postings.to_bytes() for term, postings in index[field].items()}
+        return encoded
 
-        self.content_tf_idf = self.compute_tf_idf(content_index, self.content_idf, doc_lengths)
-        self.title_tf_idf = self.compute_tf_idf(title_index, self.title_idf, doc_lengths)
-        self.author_tf_idf = self.compute_tf_idf(author_index, self.author_idf, doc_lengths)
-        self.search_terms = search_terms
+    def decode_snapshot_index(self, index):
+        decoded = dict(index)
+        for field in ('content_index', 'title_index', 'author_index'):
+            decoded[field] = {term: Postings.from_bytes(data) for term, data in index[field].items()}
+        return decoded
 
+    # Function to load the index snapshot written by a previous start, an empty dict when there is no usable one
+    def load_snapshot(self):
+        try:
+            with open(self.snapshot_file, 'rb') as f:
+                snapshot = pickle.load(f)
+        except Exception:
+            return {}
 
-search_engine = SearchEngine(folder_path='Documents')
+        if not isinstance(snapshot, dict) or snapshot.get('version') != SNAPSHOT_VERSION:
+            return {}
+        return snapshot
+
+    # Function to fingerprint every document by size, mtime and content hash. The hash is only recomputed
+    # for files whose size or mtime moved since the previous snapshot.
+    def document_signatures(self, previous_signatures):
+        signatures = {}
+
+        for file_name in os.listdir(self.folder_path):
+            file_path = os.path.join(self.folder_path, file_name)
+
+            if not (os.path.isfile(file_path) and file_name.endswith('.docx')):
+                continue
+
+            stat = os.stat(file_path)
+            previous = previous_signatures.get(file_name)
+            if previous and previous['size'] == stat.st_size and previous['mtime'] == stat.st_mtime_ns:
+                signatures[file_name] = previous
+            else:
+                signatures[file_name] = {'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'hash': self.file_hash(file_path)}
+
+        return signatures
+
+    def file_hash(self, file_path):
+        digest = hashlib.sha1()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    # The snapshot index can be reused as is when the same files are there with the same content
+    def snapshot_is_current(self, snapshot, signatures):
+        previous_signatures = snapshot.get('signatures')
+        if previous_signatures is None or previous_signatures.keys() != signatures.keys():
+            return False
+        return all(previous_signatures[name]['hash'] == signature['hash'] for name, signature in signatures.items())
+
+    # Function to return the extracted documents of the snapshot whose file did not change, so only
+    # new and modified files go through python-docx again.
+    def cached_documents(self, snapshot, signatures):
+        previous_signatures = snapshot.get('signatures', {})
+        return {
+            file_name: doc for file_name, doc in snapshot.get('documents', {}).items()
+            if file_name in signatures and previous_signatures[file_name]['hash'] == signatures[file_name]['hash']
+        }
+
+    def save_snapshot(self, signatures, documents, index):
+        snapshot = {
+            'version': SNAPSHOT_VERSION,
+            'signatures': signatures,
+            'documents': {os.path.basename(doc['file_name']): doc for doc in documents},
+            'index': index
+        }
+
+        temp_file = f"{self.snapshot_file}.tmp"
+        try:
+            with open(temp_file, 'wb') as f:
+                pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_file, self.snapshot_file)
+        except (OSError, pickle.PicklingError) as e:
+            print(f"Error: could not write the index snapshot: {e}")
+
+    # Initialize Function, reuses the on-disk snapshot when the Documents folder did not change
+    def setup_search_engine(self):
+        snapshot = self.load_snapshot()
+        signatures = self.document_signatures(snapshot.get('signatures', {}))
+
+        if self.snapshot_is_current(snapshot, signatures):
+            index = self.decode_snapshot_index(snapshot['index'])
+        else:
+            documents = self.document_extractor(self.cached_documents(snapshot, signatures))
+            index = self.build_search_index(documents)
+
+        # Files that failed to extract stay out of the snapshot, so they are retried on the next start
+        for file_name in self.extraction_errors:
+            signatures.pop(file_name, None)
+
+        if snapshot.get('signatures') != signatures:
+            self.save_snapshot(signatures, index['extracted_documents'], self.encode_snapshot_index(index))
+
+        self.extracted_documents = index['extracted_documents']
+        self.document_ids = {os.path.basename(doc['file_name']): doc_id for doc_id, doc in enumerate(self.extracted_documents)}
+        self.num_documents = len(self.extracted_documents)
+        self.doc_lengths = index['doc_lengths']
+        self.content_index = index['content_index']
+        self.title_index = index['title_index']
+        self.author_index = index['author_index']
+        self.search_terms = index['search_terms']
+        self.suggestion_trie = SuggestionTrie(self.search_terms)
+
+        self.content_terms = TermDictionary(self.content_index)
+        self.title_terms = TermDictionary(self.title_index)
+        self.author_terms = TermDictionary(self.author_index)
+        self.title_lengths = self.compute_field_lengths(self.title_index)
+        self.author_lengths = self.compute_field_lengths(self.author_index)
+        self.content_bounds = self.compute_term_bounds(self.content_index, self.doc_lengths)
+        self.title_bounds = self.compute_term_bounds(self.title_index, self.doc_lengths)
+        self.author_bounds = self.compute_term_bounds(self.author_index, self.doc_lengths)
+        self.tf_idf_matrices = {}
+
+
+# Streams changes of the Documents folder into the live index while the app keeps serving. Changed file names
+# go through a bounded queue, and the updater waits for the folder to be quiet for `debounce` seconds, so a bulk
+# copy turns into a few batched updates. Uses inotify and friends through watchdog when it is installed,
+# otherwise the folder is polled and diffed by size and mtime.
+class DocumentWatcher:
+    def __init__(self, search_engine, extensions=('.docx',), poll_interval=1.0, debounce=2.0, max_batch=1000, queue_size=10000):
+        self.search_engine = search_engine
+        self.folder_path = search_engine.folder_path
+        self.extensions = extensions
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self.max_batch = max_batch
+        self.changes = queue.Queue(maxsize=queue_size)
+        self.stop_event = threading.Event()
+        self.observer = None
+
+    def start(self):
+        if Observer is not None:
+            self.observer = Observer()
+            self.observer.schedule(DocumentEventHandler(self), self.folder_path, recursive=False)
+            self.observer.daemon = True
+            self.observer.start()
+        else:
+            threading.Thread(target=self.poll, daemon=True).start()
+
+        threading.Thread(target=self.run_updater, daemon=True).start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.observer is not None:
+            self.observer.stop()
+
+    # A full queue blocks the producer, which slows the watcher down instead of dropping changes
+    def notify(self, file_path):
+        file_name = os.path.basename(file_path)
+        if file_name.endswith(self.extensions):
+            self.changes.put(file_name)
+
+    def scan(self):
+        state = {}
+        try:
+            file_names = os.listdir(self.folder_path)
+        except OSError:
+            return state
+
+        for file_name in file_names:
+            file_path = os.path.join(self.folder_path, file_name)
+            if not (file_name.endswith(self.extensions) and os.path.isfile(file_path)):
+                continue
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                continue
+            state[file_name] = (stat.st_size, stat.st_mtime_ns)
+
+        return state
+
+    # Polling fallback, diffs the folder listing every poll_interval seconds
+    def poll(self):
+        previous = self.scan()
+
+        while not self.stop_event.wait(self.poll_interval):
+            current = self.scan()
+            for file_name in current.keys() | previous.keys():
+                if current.get(file_name) != previous.get(file_name):
+                    self.notify(file_name)
+            previous = current
+
+    # Collects file names until no change arrived for `debounce` seconds or max_batch files are pending,
+    # then hands the deduplicated batch to the search engine.
+    def run_updater(self):
+        while not self.stop_event.is_set():
+            try:
+                batch = {self.changes.get(timeout=self.poll_interval)}
+            except queue.Empty:
+                continue
+
+            while len(batch) < self.max_batch:
+                try:
+                    batch.add(self.changes.get(timeout=self.debounce))
+                except queue.Empty:
+                    break
+
+            try:
+                self.search_engine.apply_changes(sorted(batch))
+            except Exception as e:
+                print(f"Error: could not apply document changes: {e}")
+
+
+class DocumentEventHandler(FileSystemEventHandler):
+    def __init__(self, watcher):
+        self.watcher = watcher
+
+    # Opened and closed events are skipped, the updater itself opens every file it parses
+    def on_any_event(self, event):
+        if event.is_directory or event.event_type not in ('created', 'modified', 'deleted', 'moved'):
+            return
+        self.watcher.notify(event.src_path)
+        if getattr(event, 'dest_path', None):
+            self.watcher.notify(event.dest_path)
+
+
+# Worker processes of the extraction pool import this module too, only the main process builds the index
+search_engine = SearchEngine(folder_path='Documents') if multiprocessing.parent_process() is None else None
+
+
+# Function to read the optional offset and limit (or k) parameters of a search, every search returns a bounded
+# page so only the top offset + limit documents are ranked in full
+def requested_page():
+    offset = int(request.args.get('offset', 0))
+    limit = int(request.args.get('k', request.args.get('limit', DEFAULT_PAGE_SIZE)))
+
+    if offset < 0 or not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"offset {offset} or limit {limit} out of range")
+    return offset, limit
 
 
 @app.route('/suggestions', methods=['GET'])
@@ -184,7 +1191,7 @@ def suggestions():
     if not query:
         return jsonify({"error": "Query parameter is required"}), 400
 
-    suggestions = search_engine.get_suggestions(query, search_engine.search_terms, max_suggestions=6)
+    suggestions = search_engine.get_suggestions(query, max_suggestions=6)
     return jsonify({"suggestions": suggestions})
 
 
@@ -194,7 +1201,12 @@ def search_fulltext():
     if not query:
         return jsonify({"error": "Query parameter is required"}), 400
 
-    results = search_engine.search_query(query, search_engine.content_tf_idf, search_engine.content_idf, search_engine.doc_lengths, search_engine.extracted_documents)
+    try:
+        offset, limit = requested_page()
+    except ValueError:
+        return jsonify({"error": f"offset must be 0 or more and limit between 1 and {MAX_PAGE_SIZE}"}), 400
+
+    results = search_engine.search_query(query, search_engine.content_index, search_engine.doc_lengths, search_engine.extracted_documents, search_engine.content_terms, search_engine.content_bounds, offset, limit)
     return jsonify({"results": results})
 
 
@@ -204,7 +1216,12 @@ def search_author():
     if not query:
         return jsonify({"error": "Query parameter is required"}), 400
 
-    results = search_engine.search_query(query, search_engine.author_tf_idf, search_engine.author_idf, search_engine.doc_lengths, search_engine.extracted_documents)
+    try:
+        offset, limit = requested_page()
+    except ValueError:
+        return jsonify({"error": f"offset must be 0 or more and limit between 1 and {MAX_PAGE_SIZE}"}), 400
+
+    results = search_engine.search_query(query, search_engine.author_index, search_engine.doc_lengths, search_engine.extracted_documents, search_engine.author_terms, search_engine.author_bounds, offset, limit)
     return jsonify({"results": results})
 
 
@@ -214,9 +1231,73 @@ def search_title():
     if not query:
         return jsonify({"error": "Query parameter is required"}), 400
 
-    results = search_engine.search_query(query, search_engine.title_tf_idf, search_engine.title_idf, search_engine.doc_lengths, search_engine.extracted_documents)
+    try:
+        offset, limit = requested_page()
+    except ValueError:
+        return jsonify({"error": f"offset must be 0 or more and limit between 1 and {MAX_PAGE_SIZE}"}), 400
+
+    results = search_engine.search_query(query, search_engine.title_index, search_engine.doc_lengths, search_engine.extracted_documents, search_engine.title_terms, search_engine.title_bounds, offset, limit)
     return jsonify({"results": results})
 
 
+@app.route('/api/v1/search', methods=['GET'])
+def search_all_fields():
+    query = request.args.get('query', '')
+    if not query:
+        return jsonify({"error": "Query parameter is required"}), 400
+
+    try:
+        offset, limit = requested_page()
+    except ValueError:
+        return jsonify({"error": f"offset must be 0 or more and limit between 1 and {MAX_PAGE_SIZE}"}), 400
+
+    # Optional title_boost, author_boost and content_boost override the BM25F field boosts
+    try:
+        boosts = {field: float(request.args[f"{field}_boost"]) for field in BM25F_FIELDS if f"{field}_boost" in request.args}
+    except ValueError:
+        return jsonify({"error": "Field boosts must be numbers"}), 400
+    # float() also accepts nan and inf, which would turn every score into NaN or Infinity
+    if any(not math.isfinite(boost) or boost < 0 for boost in boosts.values()):
+        return jsonify({"error": "Field boosts must be finite numbers, 0 or more"}), 400
+
+    results = search_engine.search_bm25f(query, boosts, offset, limit)
+    return jsonify({"results": results})
+
+
+@app.route('/api/v1/admin/index', methods=['POST'])
+def update_index():
+    token = request.headers.get('X-Admin-Token', '')
+    if not ADMIN_TOKEN or not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        return jsonify({"error": "A valid X-Admin-Token header is required"}), 403
+
+    data = request.get_json(silent=True) or {}
+    action = data.get('action')
+    file_name = data.get('file_name')
+
+    if action not in ('add', 'update', 'remove') or not file_name:
+        return jsonify({"error": "action (add, update or remove) and file_name are required"}), 400
+
+    try:
+        if action == 'remove':
+            doc_id = search_engine.remove_document(file_name)
+        elif action == 'update':
+            doc_id = search_engine.update_document(file_name)
+        else:
+            doc_id = search_engine.add_document(file_name)
+        return jsonify({"message": f"Index {action} applied", "doc_id": doc_id}), 200
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except KeyError:
+        return jsonify({"error": f"{file_name} is not indexed"}), 404
+    except FileNotFoundError as e:
+        return jsonify({"error": str(e)}), 404
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 if __name__ == '__main__':
+    # Only the served app watches the Documents folder, importing the module starts no background threads
+    document_watcher = DocumentWatcher(search_engine)
+    document_watcher.start()
     app.run(debug=True)
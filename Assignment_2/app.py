@@ -1,7 +1,14 @@
 import os
 import string
-from math import sqrt
+import pickle
+import hashlib
+import multiprocessing
+import heapq
+from math import sqrt, log, isfinite
 from docx import Document
+from concurrent.futures import ProcessPoolExecutor
+from array import array
+from bisect import bisect_left
 from collections import defaultdict, Counter
 from flask import Flask, request, jsonify
 from flask_cors import CORS
@@ -11,54 +18,460 @@ from flask_cors import CORS
 app = Flask(__name__)
 CORS(app)
 
+# Width of one term id inside a packed phrase key, enough for vocabularies of up to 4 billion terms.
+PHRASE_ID_BITS = 32
+
+# Phrases seen fewer times than this are pruned from the suggestion terms.
+MIN_PHRASE_COUNT = 2
+
+# Bump whenever the layout of the pickled index changes, older snapshots are then rebuilt from the documents.
+SNAPSHOT_VERSION = 3
+
+# Below this many files to parse, starting worker processes costs more than it saves.
+PARALLEL_EXTRACTION_THRESHOLD = 16
+
+# Page of results a search endpoint returns when no limit is given, and the largest one it returns for one request.
+DEFAULT_PAGE_SIZE = 10
+MAX_PAGE_SIZE = 100
+
+# BM25 term frequency saturation of the combined search.
+BM25_K1 = 1.2
+
+# BM25F boost and length normalisation (b) of every field in the combined search.
+BM25F_FIELDS = {'title': (3.0, 0.5), 'author': (2.0, 0.5), 'content': (1.0, 0.75)}
+
+
+
+
+# Function to extract doc_data from specific docx file
+def extract_text_from_documents(file_path):
+    document = Document(file_path)
+    doc_data = {'title': "", 'author': "", "content": ""}
+
+    paragraphs = (p.text.strip() for p in document.paragraphs if p.text.strip())
+    for text in paragraphs:
+        if not doc_data['title']:
+            doc_data['title'] = text
+        elif text.startswith("Author:"):
+            doc_data['author'] = text[7:].strip()
+        else:
+            doc_data['content'] += f" {text}"
+
+    return doc_data
+
+
+# Process pool worker, kept at module level so it can be sent to the worker processes.
+# A broken file comes back as an error message instead of aborting the whole extraction.
+def extract_document(file_path):
+    try:
+        return extract_text_from_documents(file_path), None
+    except Exception as e:
+        return None, str(e)
+
+
+# Postings of one term: sorted doc ids and their term frequencies in two parallel typed arrays, about
+# 6 bytes per posting. Reads follow the dict interface ({doc_id: tf}) the scoring functions already use.
+class Postings:
+    __slots__ = ('doc_ids', 'tfs')
+
+    def __init__(self):
+        self.doc_ids = array('I')
+        self.tfs = array('H')
+
+    # Counts an occurrence while building, doc ids have to arrive in increasing order
+    def add(self, doc_id, count=1):
+        if self.doc_ids and self.doc_ids[-1] == doc_id:
+            self.set_tf(len(self.tfs) - 1, self.tfs[-1] + count)
+        else:
+            self.doc_ids.append(doc_id)
+            self.tfs.append(0)
+            self.set_tf(len(self.tfs) - 1, count)
+
+    # Widens the frequencies to 32 bits the first time one does not fit in 16
+    def set_tf(self, position, tf):
+        if tf > 0xFFFF and self.tfs.typecode == 'H':
+            self.tfs = array('I', self.tfs)
+        self.tfs[position] = tf
+
+    def find(self, doc_id):
+        position = bisect_left(self.doc_ids, doc_id)
+        if position < len(self.doc_ids) and self.doc_ids[position] == doc_id:
+            return position
+        return -1
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    def __contains__(self, doc_id):
+        return self.find(doc_id) >= 0
+
+    def __getitem__(self, doc_id):
+        position = self.find(doc_id)
+        if position < 0:
+            raise KeyError(doc_id)
+        return self.tfs[position]
+
+    def get(self, doc_id, default=None):
+        position = self.find(doc_id)
+        return self.tfs[position] if position >= 0 else default
+
+    def keys(self):
+        return self.doc_ids
+
+    def values(self):
+        return self.tfs
+
+    def items(self):
+        return zip(self.doc_ids, self.tfs)
+
+    # On-disk form: (doc id gap, tf) pairs as LEB128 varints
+    def to_bytes(self):
+        data = bytearray()
+        previous = 0
+        for doc_id, tf in zip(self.doc_ids, self.tfs):
+            for value in (doc_id - previous, tf):
+                while value >= 0x80:
+                    data.append((value & 0x7F) | 0x80)
+                    value >>= 7
+                data.append(value)
+            previous = doc_id
+        return bytes(data)
+
+    @classmethod
+    def from_bytes(cls, data):
+        postings = cls()
+        values = []
+        value = shift = 0
+        for byte in data:
+            value |= (byte & 0x7F) << shift
+            if byte & 0x80:
+                shift += 7
+                continue
+            values.append(value)
+            value = shift = 0
+
+        doc_id = 0
+        for position in range(0, len(values), 2):
+            doc_id += values[position]
+            postings.doc_ids.append(doc_id)
+            postings.tfs.append(0)
+            postings.set_tf(len(postings.tfs) - 1, values[position + 1])
+        return postings
+
+
+# Document-at-a-time top-k retrieval with WAND pruning. Every query term comes as (postings, weight, upper_bound),
+# a document gets weight * tf / doc_norms[doc_id] from every term it contains and upper_bound is at least the
+# largest of those. Documents whose summed upper bounds cannot beat the current k-th best score are skipped
+# without being scored. Returns (doc_id, score) best first, ties by doc id.
+def wand_top_k(terms, doc_norms, k):
+    # Cursors are [position, doc ids, tfs, weight, upper bound], bounds below 0 count as 0
+    cursors = [[0, postings.doc_ids, postings.tfs, weight, max(bound, 0)] for postings, weight, bound in terms if len(postings)]
+    # Min-heap of (score, -doc_id), the worst document of the current top k on top
+    top = []
+
+    while cursors:
+        cursors.sort(key=lambda cursor: cursor[1][cursor[0]])
+        threshold = top[0][0] if len(top) == k else None
+
+        # The pivot is the first cursor at which the upper bounds add up to more than the threshold,
+        # no document before the pivot document can enter the top k
+        pivot = None
+        accumulated = 0
+        for position, cursor in enumerate(cursors):
+            accumulated += cursor[4]
+            if threshold is None or accumulated > threshold:
+                pivot = position
+                break
+        if pivot is None:
+            break
+
+        pivot_doc = cursors[pivot][1][cursors[pivot][0]]
+        if cursors[0][1][cursors[0][0]] == pivot_doc:
+            score = 0
+            for cursor in cursors:
+                if cursor[1][cursor[0]] != pivot_doc:
+                    break
+                score += cursor[3] * cursor[2][cursor[0]] / doc_norms[pivot_doc]
+                cursor[0] += 1
+
+            # Documents come in doc id order, so a later one tied with the k-th best stays out
+            if len(top) < k:
+                heapq.heappush(top, (score, -pivot_doc))
+            elif score > top[0][0]:
+                heapq.heapreplace(top, (score, -pivot_doc))
+        else:
+            for cursor in cursors[:pivot]:
+                cursor[0] = bisect_left(cursor[1], pivot_doc, cursor[0])
+
+        cursors = [cursor for cursor in cursors if cursor[0] < len(cursor[1])]
+
+    return [(-negative_doc_id, score) for score, negative_doc_id in sorted(top, reverse=True)]
+
+
+# BM25F: the frequencies of a term in every field are length normalised per field and boosted, then BM25 saturates
+# their sum once per document. fields is a list of (index, field_lengths, average_length, boost, b), all keyed
+# by the same doc ids. Returns {doc_id: score}.
+def bm25f_scores(query_terms, fields, num_documents, k1=BM25_K1):
+    scores = defaultdict(float)
+
+    for term, query_count in Counter(query_terms).items():
+        weighted_tfs = defaultdict(float)
+        for index, field_lengths, average_length, boost, b in fields:
+            postings = index.get(term)
+            if not postings or not boost:
+                continue
+            for doc_id, tf in postings.items():
+                weighted_tfs[doc_id] += boost * tf / (1 - b + b * field_lengths[doc_id] / average_length)
+
+        # Documents containing the term in any field
+        doc_frequency = len(weighted_tfs)
+        idf = log(1 + (num_documents - doc_frequency + 0.5) / (doc_frequency + 0.5))
+        for doc_id, weighted_tf in weighted_tfs.items():
+            scores[doc_id] += query_count * idf * weighted_tf * (k1 + 1) / (k1 + weighted_tf)
+
+    return scores
+
+
+# Compressed prefix trie over the suggestion terms. Every node caches its top-k terms by frequency,
+# so a lookup only walks the prefix and returns the cached list instead of scanning the vocabulary.
+class SuggestionTrie:
+    def __init__(self, search_terms, top_k=10):
+        self.top_k = top_k
+        self.search_terms = search_terms
+        self.rank = {term: rank for rank, term in enumerate(search_terms)}
+        self.root = self.build_node(sorted(search_terms), 0, len(search_terms), 0)
+
+    def sort_key(self, term):
+        return (-self.search_terms[term], self.rank[term])
+
+    # Builds the node for the sorted terms[lo:hi], which all share their first `depth` characters
+    def build_node(self, terms, lo, hi, depth):
+        node = {'label': "", 'children': {}, 'top': []}
+        if lo >= hi:
+            return node
+
+        first, last = terms[lo], terms[hi - 1]
+        end = depth
+        while end < min(len(first), len(last)) and first[end] == last[end]:
+            end += 1
+        node['label'] = first[depth:end]
+
+        candidates = []
+        if len(first) == end:
+            candidates.append(first)
+            lo += 1
+
+        while lo < hi:
+            char = terms[lo][end]
+            child_hi = lo + 1
+            while child_hi < hi and terms[child_hi][end] == char:
+                child_hi += 1
+            child = self.build_node(terms, lo, child_hi, end)
+            node['children'][char] = child
+            candidates.extend(child['top'])
+            lo = child_hi
+
+        node['top'] = sorted(candidates, key=self.sort_key)[:self.top_k]
+        return node
+
+    # Function to return the most frequent terms starting with the prefix
+    def suggest(self, prefix, max_suggestions=5):
+        node = self.root
+        position = 0
+
+        while True:
+            label = node['label']
+            remaining = prefix[position:]
+            if remaining.startswith(label) or label.startswith(remaining):
+                position += len(label)
+            else:
+                return []
+
+            if position >= len(prefix):
+                return node['top'][:max_suggestions]
+
+            node = node['children'].get(prefix[position])
+            if node is None:
+                return []
 
 
 
 class SearchEngine:
-    def __init__(self, folder_path='Documents'):
+    def __init__(self, folder_path='Documents', snapshot_file='index_snapshot.pkl', extraction_workers=None):
         self.folder_path = folder_path
+        self.snapshot_file = snapshot_file
+        self.extraction_workers = extraction_workers
+        self.extraction_errors = {}
         self.extracted_documents, self.content_index, self.title_index, self.author_index, self.doc_lengths, self.search_terms = self.setup_search_engine()
-
+        self.suggestion_trie = SuggestionTrie(self.search_terms)
+
+        # Document vector lengths and sorted vocabulary of every index, both derived from the postings
+        self.content_norms = self.compute_doc_norms(self.content_index)
+        self.title_norms = self.compute_doc_norms(self.title_index)
+        self.author_norms = self.compute_doc_norms(self.author_index)
+        self.content_terms = sorted(self.content_index)
+        self.title_terms = sorted(self.title_index)
+        self.author_terms = sorted(self.author_index)
+        self.title_lengths = self.compute_field_lengths(self.title_index)
+        self.author_lengths = self.compute_field_lengths(self.author_index)
+        self.content_bounds = self.compute_term_bounds(self.content_index, self.content_norms)
+        self.title_bounds = self.compute_term_bounds(self.title_index, self.title_norms)
+        self.author_bounds = self.compute_term_bounds(self.author_index, self.author_norms)
+
+    # Function to load the indexes from the on-disk snapshot when the Documents folder did not change,
+    # otherwise only new and modified documents are parsed again before the indexes are rebuilt.
     def setup_search_engine(self):
-        extracted_documents = self.document_extractor()
+        snapshot = self.load_snapshot()
+        signatures = self.document_signatures(snapshot.get('signatures', {}))
+
+        if self.snapshot_is_current(snapshot, signatures):
+            index = self.decode_snapshot_index(snapshot['index'])
+        else:
+            index = self.build_search_index(self.document_extractor(self.cached_documents(snapshot, signatures)))
+
+        # Files that failed to extract stay out of the snapshot, so they are retried on the next start
+        for file_name in self.extraction_errors:
+            signatures.pop(file_name, None)
+
+        if snapshot.get('signatures') != signatures:
+            self.save_snapshot(signatures, index[0], self.encode_snapshot_index(index))
+
+        return index
+
+    # Function to load the index snapshot written by a previous start, an empty dict when there is no usable one
+    def load_snapshot(self):
+        try:
+            with open(self.snapshot_file, 'rb') as f:
+                snapshot = pickle.load(f)
+        except Exception:
+            return {}
+
+        if not isinstance(snapshot, dict) or snapshot.get('version') != SNAPSHOT_VERSION:
+            return {}
+        return snapshot
+
+    # Function to fingerprint every document by size, mtime and content hash. The hash is only recomputed
+    # for files whose size or mtime moved since the previous snapshot.
+    def document_signatures(self, previous_signatures):
+        signatures = {}
+
+        for file_name in os.listdir(self.folder_path):
+            file_path = os.path.join(self.folder_path, file_name)
+
+            if not (os.path.isfile(file_path) and file_name.endswith('.docx')):
+                continue
+
+            stat = os.stat(file_path)
+            previous = previous_signatures.get(file_name)
+            if previous and previous['size'] == stat.st_size and previous['mtime'] == stat.st_mtime_ns:
+                signatures[file_name] = previous
+            else:
+                signatures[file_name] = {'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'hash': self.file_hash(file_path)}
+
+        return signatures
+
+    def file_hash(self, file_path):
+        digest = hashlib.sha1()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    # The snapshot index can be reused as is when the same files are there with the same content
+    def snapshot_is_current(self, snapshot, signatures):
+        previous_signatures = snapshot.get('signatures')
+        if previous_signatures is None or previous_signatures.keys() != signatures.keys():
+            return False
+        return all(previous_signatures[name]['hash'] == signature['hash'] for name, signature in signatures.items())
+
+    # Function to return the extracted documents of the snapshot whose file did not change, so only
+    # new and modified files go through python-docx again.
+    def cached_documents(self, snapshot, signatures):
+        previous_signatures = snapshot.get('signatures', {})
+        return {
+            file_name: doc for file_name, doc in snapshot.get('documents', {}).items()
+            if file_name in signatures and previous_signatures[file_name]['hash'] == signatures[file_name]['hash']
+        }
+
+    def save_snapshot(self, signatures, documents, index):
+        snapshot = {
+            'version': SNAPSHOT_VERSION,
+            'signatures': signatures,
+            'documents': {os.path.basename(doc['file_name']): doc for doc in documents},
+            'index': index
+        }
+
+        temp_file = f"{self.snapshot_file}.tmp"
+        try:
+            with open(temp_file, 'wb') as f:
+                pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_file, self.snapshot_file)
+        except (OSError, pickle.PicklingError) as e:
+            print(f"Error: could not write the index snapshot: {e}")
+
+    # The snapshot keeps postings in their delta + varint byte form
+    def encode_snapshot_index(self, index):
+        documents, content_index, title_index, author_index, doc_lengths, search_terms = index
+        encode = lambda postings_index: {term: postings.to_bytes() for term, postings in postings_index.items()}
+        return documents, encode(content_index), encode(title_index), encode(author_index), doc_lengths, search_terms
+
+    def decode_snapshot_index(self, index):
+        documents, content_index, title_index, author_index, doc_lengths, search_terms = index
+        decode = lambda postings_index: {term: Postings.from_bytes(data) for term, data in postings_index.items()}
+        return documents, decode(content_index), decode(title_index), decode(author_index), doc_lengths, search_terms
+
+    # Builds every index from the extracted documents, this tuple is what the snapshot stores
+    def build_search_index(self, extracted_documents):
         extracted_content = self.extract_fullContext_from_documents(extracted_documents)
         extracted_titles = self.extract_titles_from_documents(extracted_documents)
         extracted_authors = self.extract_author_from_documents(extracted_documents)
         
         content_index, doc_lengths, search_terms = self.build_index(extracted_content)
-        title_index, _, _ = self.build_index(extracted_titles)
-        author_index, _, _ = self.build_index(extracted_authors)
+        title_index, _, _ = self.build_index(extracted_titles, count_phrases=False)
+        author_index, _, _ = self.build_index(extracted_authors, count_phrases=False)
 
-        return extracted_documents, content_index, title_index, author_index, doc_lengths, search_terms
+        return extracted_documents, dict(content_index), dict(title_index), dict(author_index), doc_lengths, search_terms
 
-    def extract_text_from_documents(self, file_path):
-        document = Document(file_path)
-        doc_data = {'title': "", 'author': "", "content": ""}
-
-        paragraphs = (p.text.strip() for p in document.paragraphs if p.text.strip())
-        for text in paragraphs:
-            if not doc_data['title']:
-                doc_data['title'] = text
-            elif text.startswith("Author:"):
-                doc_data['author'] = text[7:].strip()
-            else:
-                doc_data['content'] += f" {text}"
+    def document_extractor(self, cached_documents=None):
+        cached_documents = cached_documents or {}
+        documents = []
 
-        return doc_data
+        # Sorted, so doc ids do not depend on the order the filesystem lists the folder in
+        file_names = [
+            file_name for file_name in sorted(os.listdir(self.folder_path))
+            if os.path.isfile(os.path.join(self.folder_path, file_name)) and file_name.endswith('.docx')
+        ]
+        pending = [file_name for file_name in file_names if file_name not in cached_documents]
+        extracted = dict(zip(pending, self.extract_files([os.path.join(self.folder_path, file_name) for file_name in pending])))
 
-    def document_extractor(self):
-        documents = []
-        for file_name in os.listdir(self.folder_path):
+        self.extraction_errors = {}
+        for file_name in file_names:
             file_path = os.path.join(self.folder_path, file_name)
-            if not (os.path.isfile(file_path) and file_name.endswith('.docx')):
+
+            if file_name in cached_documents:
+                documents.append(cached_documents[file_name])
+                continue
+
+            doc_data, error = extracted[file_name]
+            if error is not None:
+                print(f"Error: could not extract {file_path}: {error}")
+                self.extraction_errors[file_name] = error
                 continue
 
-            doc_data = self.extract_text_from_documents(file_path)
             doc_data['file_name'] = file_path
             documents.append(doc_data)
 
         return documents
 
+    # Function to parse the given files in order, fanned out over a process pool when there are enough of them
+    def extract_files(self, file_paths):
+        workers = self.extraction_workers or os.cpu_count() or 1
+        if workers < 2 or len(file_paths) < PARALLEL_EXTRACTION_THRESHOLD:
+            return [extract_document(file_path) for file_path in file_paths]
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(extract_document, file_paths, chunksize=max(1, len(file_paths) // (workers * 4))))
+
     def extract_fullContext_from_documents(self, documents):
         return [
             f"Title: {doc['title']}\nAuthor: {doc['author']}\nContent: {doc['content']}"
@@ -66,82 +479,172 @@ class SearchEngine:
         ]
 
     def extract_titles_from_documents(self, documents):
-        return [doc['title'] for doc in documents if doc.get('title')]
+        return [doc['title'] for doc in documents]
 
     def extract_author_from_documents(self, documents):
-        return [doc['author'] for doc in documents if doc.get('author')]
+        return [doc['author'] for doc in documents]
 
     def preprocess_text(self, text):
         stopwords = {"the", "and", "is", "in", "to", "of", "on", "for", "with", "a", "an", "as", "by", "this", "it", "at", "or", "that"}
         translator = str.maketrans('', '', string.punctuation)
         return [word for word in text.lower().translate(translator).split() if word not in stopwords]
 
-    def build_index(self, documents):
-        index = defaultdict(lambda: {'doc_ids': [], 'tf': {}})
+    def build_index(self, documents, count_phrases=True):
+        index = defaultdict(Postings)
         doc_lengths = {}
-        search_terms = defaultdict(int)
+        term_ids = {}
+        phrase_counts = Counter()
 
         for doc_id, content in enumerate(documents):
             words = self.preprocess_text(content)
             doc_lengths[doc_id] = len(words)
 
-            for i in range(len(words)):
-                word = words[i]
-                if doc_id not in index[word]['tf']:
-                    index[word]['tf'][doc_id] = 0
-                index[word]['tf'][doc_id] += 1
-                search_terms[word] += 1
+            for word in words:
+                index[word].add(doc_id)
 
-                for j in range(i + 1, min(i + 5, len(words) + 1)):
-                    phrase = " ".join(words[i:j])
-                    search_terms[phrase] += 1
-
-                index[word]['doc_ids'].append(doc_id)
+            if count_phrases:
+                self.count_phrases(words, term_ids, phrase_counts)
 
+        search_terms = self.build_search_terms(term_ids, phrase_counts)
         return index, doc_lengths, search_terms
 
-    # Function that takes query vector and document vector and find the cosine similarity score
-    def compute_cosine_similarity(self, query_vector, document_vector):
-        dot_product = sum(query_vector.get(term, 0) * document_vector.get(term, 0) for term in query_vector)
-        query_magnitude = sqrt(sum(val ** 2 for val in query_vector.values()))
-        document_magnitude = sqrt(sum(val ** 2 for val in document_vector.values()))
-        if query_magnitude == 0 or document_magnitude == 0:
-            return 0.0
-        return dot_product / (query_magnitude * document_magnitude)
+    # Counts the 1 to 4 word phrases of a document under packed integer keys (one term id per PHRASE_ID_BITS),
+    # so no phrase string is built while counting.
+    def count_phrases(self, words, term_ids, phrase_counts):
+        ids = [term_ids.setdefault(word, len(term_ids) + 1) for word in words]
 
-    def suggest_keywords(self, input_text):
-        input_text = input_text.lower()
-        suggestions = [term for term in self.search_terms if term.startswith(input_text)]
-        return sorted(suggestions, key=lambda x: self.search_terms[x], reverse=True)[:5]
+        for i in range(len(ids)):
+            # Single words get counted once more on their own, which keeps them ahead of equally frequent phrases
+            phrase_counts[ids[i]] += 1
+
+            key = 0
+            for n in range(min(4, len(ids) - i)):
+                key |= ids[i + n] << (PHRASE_ID_BITS * n)
+                phrase_counts[key] += 1
 
-    # Search Function
-    def search(self, query, index):
-        # Preprocess the query text and convert it into a term frequency vector
-        query_terms = self.preprocess_text(query)
-        query_vector = Counter(query_terms)
+    # Function to prune the counted phrases and turn the survivors into search terms for suggestion purpose.
+    # Single words are always kept, phrases need min_count occurrences and at most max_phrases of them are kept.
+    def build_search_terms(self, term_ids, phrase_counts, min_count=MIN_PHRASE_COUNT, max_phrases=None):
+        words = [None] + list(term_ids)
+        mask = (1 << PHRASE_ID_BITS) - 1
 
-        relevant_docs = defaultdict(float)  # Stores cosine similarity for each document
+        phrases = [key for key, count in phrase_counts.items() if key > mask and count >= min_count]
+        if max_phrases is not None and len(phrases) > max_phrases:
+            phrases = set(heapq.nlargest(max_phrases, phrases, key=phrase_counts.get))
+        else:
+            phrases = set(phrases)
+
+        search_terms = defaultdict(int)
+        for key, count in phrase_counts.items():
+            if key > mask and key not in phrases:
+                continue
 
-        # Iterate over all terms in the query
-        for term in query_terms:
-            # Look for partial matches in the index (terms that start with the query term)
-            matching_terms = [word for word in index if word.startswith(term)]
+            phrase = []
+            while key:
+                phrase.append(words[key & mask])
+                key >>= PHRASE_ID_BITS
+            search_terms[" ".join(phrase)] = count
+
+        return search_terms
+
+    # Function that computes the magnitude of every document vector (term frequencies) of an index
+    def compute_doc_norms(self, index):
+        squares = defaultdict(int)
+        for postings in index.values():
+            for doc_id, tf in postings.items():
+                squares[doc_id] += tf * tf
+        return {doc_id: sqrt(total) for doc_id, total in squares.items()}
+
+    # Function that computes the largest tf / document magnitude of every term, the WAND upper bound
+    # of what the term adds to a cosine score once multiplied by its query weight
+    def compute_term_bounds(self, index, doc_norms):
+        return {term: max(tf / doc_norms[doc_id] for doc_id, tf in postings.items()) for term, postings in index.items()}
+
+    # Function that computes the number of indexed words of every document in one field, from its postings
+    def compute_field_lengths(self, index):
+        field_lengths = defaultdict(int)
+        for postings in index.values():
+            for doc_id, tf in postings.items():
+                field_lengths[doc_id] += tf
+        return dict(field_lengths)
+
+    # Function that ranks the documents against the title, author and content indexes in one pass with BM25F.
+    # Terms match exactly, boosts overrides the default boost of the fields it names.
+    def search_bm25f(self, query, boosts=None, offset=0, limit=None):
+        boosts = boosts or {}
+        num_documents = len(self.extracted_documents)
+
+        fields = []
+        for field, index, field_lengths in (
+            ('title', self.title_index, self.title_lengths),
+            ('author', self.author_index, self.author_lengths),
+            ('content', self.content_index, self.doc_lengths)
+        ):
+            boost, b = BM25F_FIELDS[field]
+            average_length = sum(field_lengths.values()) / max(num_documents, 1)
+            fields.append((index, field_lengths, average_length, boosts.get(field, boost), b))
+
+        scores = bm25f_scores(self.preprocess_text(query), fields, num_documents)
+        if limit is not None:
+            ranked_docs = heapq.nsmallest(offset + limit, scores.items(), key=lambda x: (-x[1], x[0]))
+        else:
+            ranked_docs = sorted(scores.items(), key=lambda x: (-x[1], x[0]))
 
-            # For each matching term, iterate through the documents in the index
-            for matching_term in matching_terms:
-                for doc_id, tf in index[matching_term]['tf'].items():
-                    # Use the pre-calculated term frequency (TF) for the document
-                    document_vector = {matching_term: tf}  # Create a document vector with the pre-calculated TF
+        results = []
+        for doc_id, _ in ranked_docs[offset:]:
+            doc = self.extracted_documents[doc_id]
+            snippet = f"{doc['content'][:180].rsplit(' ', 1)[0]}..." if len(doc['content']) > 100 else doc['content']
+            results.append({'title': doc['title'], 'author': doc['author'], 'snippet': snippet.replace("Abstract", ""), 'file_path': doc['file_name']})
 
-                    # Compute cosine similarity between query and document vector
-                    similarity = self.compute_cosine_similarity(query_vector, document_vector)
-                    relevant_docs[doc_id] += similarity
+        return results
 
-        # Sort the results by similarity in descending order
-        ranked_docs = sorted(relevant_docs.items(), key=lambda x: x[1], reverse=True)
+    # Function that returns the indexed terms starting with the prefix, terms being the sorted vocabulary of the index
+    def prefix_matches(self, terms, prefix):
+        start = bisect_left(terms, prefix)
+        return terms[start:bisect_left(terms, prefix + chr(0x10FFFF), start)]
 
+    def suggest_keywords(self, input_text):
+        input_text = input_text.lower()
+        return self.suggestion_trie.suggest(input_text, max_suggestions=5)
+
+    # Search Function, ranks documents by the cosine similarity of their term frequency vector with the query vector
+    def search(self, query, index, doc_norms, terms, term_bounds, offset=0, limit=None):
+        top_k = offset + limit if limit is not None else None
+
+        # Every query term counts for all the indexed terms it is a prefix of (partial matches)
+        query_vector = Counter()
+        for term in self.preprocess_text(query):
+            for matching_term in self.prefix_matches(terms, term):
+                query_vector[matching_term] += 1
+
+        query_magnitude = sqrt(sum(weight ** 2 for weight in query_vector.values()))
+
+        if top_k is not None:
+            # Only the best k are needed, WAND skips the documents that cannot make it
+            query_terms = []
+            for term, weight in query_vector.items():
+                weight /= query_magnitude
+                query_terms.append((index[term], weight, weight * term_bounds[term]))
+            ranked_docs = wand_top_k(query_terms, doc_norms, top_k)
+        else:
+            # Term at a time: the dot products only touch the postings of the query terms
+            dot_products = defaultdict(int)
+            for term, weight in query_vector.items():
+                for doc_id, tf in index[term].items():
+                    dot_products[doc_id] += weight * tf
+
+            # Normalised once per candidate with the precomputed document magnitude
+            relevant_docs = [
+                (doc_id, dot_product / (query_magnitude * doc_norms[doc_id]))
+                for doc_id, dot_product in dot_products.items()
+            ]
+
+            # Sort the results by similarity in descending order
+            ranked_docs = sorted(relevant_docs, key=lambda x: (-x[1], x[0]))
+
+        # Only the requested page gets its snippets and result dicts built
         results = []
-        for doc_id, _ in ranked_docs:
+        for doc_id, _ in ranked_docs[offset:]:
             doc = self.extracted_documents[doc_id]
             snippet = f"{doc['content'][:180].rsplit(' ', 1)[0]}..." if len(doc['content']) > 100 else doc['content']
             results.append({'title': doc['title'], 'author': doc['author'], 'snippet': snippet.replace("Abstract", ""), 'file_path': doc['file_name']})
@@ -153,7 +656,19 @@ class SearchEngine:
 
 
 # Initialize the search engine once when the app starts
-search_engine = SearchEngine('Documents')
+# Worker processes of the extraction pool import this module too, only the main process builds the index
+search_engine = SearchEngine('Documents') if multiprocessing.parent_process() is None else None
+
+# Function to read the optional offset and limit (or k) parameters of a search, every search returns a bounded
+# page so only the top offset + limit documents are ranked in full
+def requested_page():
+    offset = int(request.args.get('offset', 0))
+    limit = int(request.args.get('k', request.args.get('limit', DEFAULT_PAGE_SIZE)))
+
+    if offset < 0 or not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"offset {offset} or limit {limit} out of range")
+    return offset, limit
+
 
 @app.route('/api/suggestions', methods=['GET'])
 def suggestions():
@@ -171,7 +686,12 @@ def search_author():
     if not query:
         return jsonify({"error": "Query parameter is required"}), 400
 
-    results = search_engine.search(query, search_engine.author_index)
+    try:
+        offset, limit = requested_page()
+    except ValueError:
+        return jsonify({"error": f"offset must be 0 or more and limit between 1 and {MAX_PAGE_SIZE}"}), 400
+
+    results = search_engine.search(query, search_engine.author_index, search_engine.author_norms, search_engine.author_terms, search_engine.author_bounds, offset, limit)
     return jsonify({"results": results})
 
 @app.route('/api/v2/search/title', methods=['GET'])
@@ -180,7 +700,12 @@ def search_title():
     if not query:
         return jsonify({"error": "Query parameter is required"}), 400
 
-    results = search_engine.search(query, search_engine.title_index)
+    try:
+        offset, limit = requested_page()
+    except ValueError:
+        return jsonify({"error": f"offset must be 0 or more and limit between 1 and {MAX_PAGE_SIZE}"}), 400
+
+    results = search_engine.search(query, search_engine.title_index, search_engine.title_norms, search_engine.title_terms, search_engine.title_bounds, offset, limit)
     return jsonify({"results": results})
 
 @app.route('/api/v2/search/fulltext', methods=['GET'])
@@ -189,7 +714,36 @@ def search_fulltext():
     if not query:
         return jsonify({"error": "Query parameter is required"}), 400
 
-    results = search_engine.search(query, search_engine.content_index)
+    try:
+        offset, limit = requested_page()
+    except ValueError:
+        return jsonify({"error": f"offset must be 0 or more and limit between 1 and {MAX_PAGE_SIZE}"}), 400
+
+    results = search_engine.search(query, search_engine.content_index, search_engine.content_norms, search_engine.content_terms, search_engine.content_bounds, offset, limit)
+    return jsonify({"results": results})
+
+
+@app.route('/api/v2/search', methods=['GET'])
+def search_all_fields():
+    query = request.args.get('query', '')
+    if not query:
+        return jsonify({"error": "Query parameter is required"}), 400
+
+    try:
+        offset, limit = requested_page()
+    except ValueError:
+        return jsonify({"error": f"offset must be 0 or more and limit between 1 and {MAX_PAGE_SIZE}"}), 400
+
+    # Optional title_boost, author_boost and content_boost override the BM25F field boosts
+    try:
+        boosts = {field: float(request.args[f"{field}_boost"]) for field in BM25F_FIELDS if f"{field}_boost" in request.args}
+    except ValueError:
+        return jsonify({"error": "Field boosts must be numbers"}), 400
+    # float() also accepts nan and inf, which would turn every score into NaN or Infinity
+    if any(not isfinite(boost) or boost < 0 for boost in boosts.values()):
+        return jsonify({"error": "Field boosts must be finite numbers, 0 or more"}), 400
+
+    results = search_engine.search_bm25f(query, boosts, offset, limit)
     return jsonify({"results": results})
 
 
@@ -1,69 +1,448 @@
 import os
 import string
+import pickle
+import hashlib
+import multiprocessing
 import json
+import math
+import heapq
+import threading
 from docx import Document
-from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from collections import defaultdict, OrderedDict
 from flask import Flask, request, jsonify
 from flask_cors import CORS
+from evaluation import evaluate_run, judged_queries
 
 
 app = Flask(__name__)
 CORS(app)
 
+# Bump whenever the layout of the pickled index changes, older snapshots are then rebuilt from the documents.
+SNAPSHOT_VERSION = 1
+
+# Below this many files to parse, starting worker processes costs more than it saves.
+PARALLEL_EXTRACTION_THRESHOLD = 16
+
+# Ranking models of the search endpoints: Dice over the binary vectors, the probabilistic BIM term
+# weights, and BM25 over the same binary index.
+RANKING_MODELS = ('dice', 'bim', 'bm25')
+
+# BM25 saturation and length normalisation parameters.
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Page of results a search endpoint returns when no limit is given, and the largest one it returns for one request.
+DEFAULT_PAGE_SIZE = 10
+MAX_PAGE_SIZE = 100
+
+# Rocchio weights of the query, the relevant and the non-relevant documents of a keyword's feedback,
+# how many feedback terms are added to the query, and how many keywords keep their expanded query cached.
+ROCCHIO_ALPHA = 1.0
+ROCCHIO_BETA = 0.75
+ROCCHIO_GAMMA = 0.15
+ROCCHIO_EXPANSION_TERMS = 20
+EXPANSION_CACHE_SIZE = 1024
+
+# Feedback terms found in more than this share of the documents are too common to expand a query with, and an
+# added term needs at least this share of the weight of the strongest query term.
+ROCCHIO_MAX_DF_RATIO = 0.5
+ROCCHIO_MIN_WEIGHT_RATIO = 0.25
+
+# Labels extract_fullContext_from_documents puts in front of every document, they say nothing about its topic.
+ROCCHIO_TEMPLATE_TERMS = {"title", "author", "content"}
+
+
+
+# Function to extract doc_data from specific docx file
+def extract_text_from_documents(file_path):
+    document = Document(file_path)
+    doc_data = {'title': "", 'author': "", 'content': ""}
+
+    paragraphs = (p.text.strip() for p in document.paragraphs if p.text.strip())
+    for text in paragraphs:
+        if not doc_data['title']:
+            doc_data['title'] = text
+        elif text.startswith("Author:"):
+            doc_data['author'] = text[7:].strip()
+        else:
+            doc_data['content'] += f"{text}"
+
+    return doc_data
+
+
+# Process pool worker, kept at module level so it can be sent to the worker processes.
+# A broken file comes back as an error message instead of aborting the whole extraction.
+def extract_document(file_path):
+    try:
+        return extract_text_from_documents(file_path), None
+    except Exception as e:
+        return None, str(e)
+
+
+# Compressed prefix trie over the suggestion terms. Every node caches its top-k terms by frequency,
+# so a lookup only walks the prefix and returns the cached list instead of scanning the vocabulary.
+class SuggestionTrie:
+    def __init__(self, search_terms, top_k=10):
+        self.top_k = top_k
+        self.search_terms = search_terms
+        self.rank = {term: rank for rank, term in enumerate(search_terms)}
+        self.root = self.build_node(sorted(search_terms), 0, len(search_terms), 0)
+
+    def sort_key(self, term):
+        return (-self.search_terms[term], self.rank[term])
+
+    # Builds the node for the sorted terms[lo:hi], which all share their first `depth` characters
+    def build_node(self, terms, lo, hi, depth):
+        node = {'label': "", 'children': {}, 'top': []}
+        if lo >= hi:
+            return node
+
+        first, last = terms[lo], terms[hi - 1]
+        end = depth
+        while end < min(len(first), len(last)) and first[end] == last[end]:
+            end += 1
+        node['label'] = first[depth:end]
+
+        candidates = []
+        if len(first) == end:
+            candidates.append(first)
+            lo += 1
+
+        while lo < hi:
+            char = terms[lo][end]
+            child_hi = lo + 1
+            while child_hi < hi and terms[child_hi][end] == char:
+                child_hi += 1
+            child = self.build_node(terms, lo, child_hi, end)
+            node['children'][char] = child
+            candidates.extend(child['top'])
+            lo = child_hi
+
+        node['top'] = sorted(candidates, key=self.sort_key)[:self.top_k]
+        return node
+
+    # Function to return the most frequent terms starting with the prefix
+    def suggest(self, prefix, max_suggestions=5):
+        node = self.root
+        position = 0
+
+        while True:
+            label = node['label']
+            remaining = prefix[position:]
+            if remaining.startswith(label) or label.startswith(remaining):
+                position += len(label)
+            else:
+                return []
+
+            if position >= len(prefix):
+                return node['top'][:max_suggestions]
+
+            node = node['children'].get(prefix[position])
+            if node is None:
+                return []
+
+
+
+# Feedback store made of the feedback.json snapshot plus an append-only JSONL log next to it. A click only appends
+# one line to the log: writers queue their record and wait while one of them writes and fsyncs everything queued
+# so far (group commit), so a burst of clicks shares a single fsync. Every `compact_every` records the state is
+# written back to the snapshot and the log starts over. Loading replays the log on top of the snapshot.
+class FeedbackLog:
+    def __init__(self, snapshot_file, log_file=None, compact_every=1000):
+        self.snapshot_file = snapshot_file
+        self.log_file = log_file or f"{snapshot_file}.log"
+        self.compact_every = compact_every
+        self.feedback = defaultdict(dict)
+        self.logged_records = 0
+        self.pending = []
+        self.queued = 0
+        self.committed = 0
+        self.committing = False
+        self.condition = threading.Condition()
+
+    # Function to rebuild the feedback from the snapshot and the records logged after it
+    def load(self):
+        feedback = defaultdict(dict)
+        try:
+            with open(self.snapshot_file, 'r') as f:
+                for keyword, relevances in json.load(f).items():
+                    feedback[keyword].update(relevances)
+        except FileNotFoundError:
+            pass
+        except json.JSONDecodeError as e:
+            print(f"Error: could not read {self.snapshot_file}: {e}")
+
+        logged_records = 0
+        try:
+            with open(self.log_file, 'rb+') as f:
+                lines = f.readlines()
+                valid_end = 0
+                for line_number, line in enumerate(lines, 1):
+                    try:
+                        record = json.loads(line) if line.endswith(b"\n") else None
+                    except json.JSONDecodeError:
+                        record = None
+                    if record is None and line_number == len(lines):
+                        # A torn last line from a crash mid-append, it was never acknowledged. It is cut off
+                        # so the next records do not get appended behind it.
+                        f.truncate(valid_end)
+                        break
+                    if record is None:
+                        # A corrupt line in the middle, the acknowledged records after it are still read
+                        print(f"Error: skipping unreadable line {line_number} of {self.log_file}")
+                    else:
+                        feedback[record['keyword']][record['doc_id']] = record['relevance']
+                        logged_records += 1
+                    valid_end += len(line)
+        except FileNotFoundError:
+            pass
+
+        with self.condition:
+            self.feedback = feedback
+            self.logged_records = logged_records
+        return feedback
+
+    # Function to record one judgement, returns once it is durable in the log
+    def append(self, doc_id, keyword, relevance):
+        # Doc ids are JSON object keys in the snapshot, so they are kept as strings everywhere
+        record = {'doc_id': str(doc_id), 'keyword': keyword, 'relevance': relevance}
+
+        with self.condition:
+            self.feedback[keyword][record['doc_id']] = relevance
+            self.pending.append(json.dumps(record) + "\n")
+            self.queued += 1
+            sequence = self.queued
+
+            while self.committed < sequence:
+                if self.committing:
+                    self.condition.wait()
+                    continue
+
+                # This writer commits the whole queue, the others wait for it
+                self.committing = True
+                batch, self.pending = self.pending, []
+                batch_end = self.queued
+                self.condition.release()
+                try:
+                    self.write_batch(batch)
+                except Exception:
+                    self.condition.acquire()
+                    self.pending = batch + self.pending
+                    self.committing = False
+                    self.condition.notify_all()
+                    raise
+
+                self.condition.acquire()
+                self.committed = batch_end
+                self.logged_records += len(batch)
+                try:
+                    if self.logged_records >= self.compact_every:
+                        self.compact()
+                except Exception as e:
+                    # The batch is durable in the log, an uncompacted log still loads the same feedback
+                    print(f"Error: could not compact {self.log_file}: {e}")
+                finally:
+                    self.committing = False
+                    self.condition.notify_all()
+
+    def write_batch(self, batch):
+        with open(self.log_file, 'a') as f:
+            f.writelines(batch)
+            f.flush()
+            os.fsync(f.fileno())
+
+    # Function to fold the log into the snapshot, called with the condition held while committing so no
+    # record reaches the log in between. The snapshot also holds the records still queued, they are written
+    # to the new log afterwards and replaying them again is harmless.
+    def compact(self):
+        temp_file = f"{self.snapshot_file}.tmp"
+        with open(temp_file, 'w') as f:
+            json.dump(self.feedback, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, self.snapshot_file)
+
+        with open(self.log_file, 'w') as f:
+            os.fsync(f.fileno())
+        self.logged_records = 0
+
+    # Function to return the judgements of one keyword as a list of (doc_id, relevance)
+    def relevances(self, keyword):
+        with self.condition:
+            return list(self.feedback.get(keyword, {}).items())
+
+    # Function to return a copy of every judgement, {keyword: {doc_id: relevance}}
+    def judgments(self):
+        with self.condition:
+            return {keyword: dict(relevances) for keyword, relevances in self.feedback.items()}
 
 
 class SearchEngine:
 
-    def __init__(self, folder_path='Documents', feedback_file='feedback.json'):
+    def __init__(self, folder_path='Documents', feedback_file='feedback.json', snapshot_file='index_snapshot.pkl', extraction_workers=None):
         self.folder_path = folder_path
         self.feedback_file = feedback_file
+        self.feedback_log = FeedbackLog(feedback_file)
+        self.snapshot_file = snapshot_file
+        self.extraction_workers = extraction_workers
+        self.extraction_errors = {}
         self.documents, self.content_index, self.title_index, self.search_terms = self.setup_search_engine()
+        self.suggestion_trie = SuggestionTrie(self.search_terms)
         self.user_feedback = self.load_feedback()
-
+        # Number of distinct terms of every document, the size of its binary vector
+        self.content_sizes = self.compute_doc_sizes(self.content_index)
+        self.title_sizes = self.compute_doc_sizes(self.title_index)
+        # Rocchio expanded queries by keyword, least recently used first. The generation counts the feedback
+        # stored so far, an expansion built while new feedback came in is not cached.
+        self.expansion_cache = OrderedDict()
+        self.expansion_lock = threading.Lock()
+        self.feedback_generation = 0
+        # Squared length of every document as a vector of BIM term weights, by id() of the index, built on first use
+        self.bim_doc_norms = {}
+
+    # Function to load the indexes from the on-disk snapshot when the Documents folder did not change,
+    # otherwise only new and modified documents are parsed again before the indexes are rebuilt.
     def setup_search_engine(self):
-        extracted_documents = self.document_extractor(self.folder_path)
+        snapshot = self.load_snapshot()
+        signatures = self.document_signatures(snapshot.get('signatures', {}))
 
-        extracted_fulltext = self.extract_fullContext_from_documents(extracted_documents)
-        extracted_titles = self.extract_titles_from_documents(extracted_documents)
+        if self.snapshot_is_current(snapshot, signatures):
+            index = snapshot['index']
+        else:
+            index = self.build_search_index(self.document_extractor(self.folder_path, self.cached_documents(snapshot, signatures)))
 
-        content_index, search_terms = self.build_binary_index(extracted_fulltext)
-        title_index, _ = self.build_binary_index(extracted_titles)
+        # Files that failed to extract stay out of the snapshot, so they are retried on the next start
+        for file_name in self.extraction_errors:
+            signatures.pop(file_name, None)
+
+        if snapshot.get('signatures') != signatures:
+            self.save_snapshot(signatures, index[0], index)
+
+        return index
+
+    # Function to load the index snapshot written by a previous start, an empty dict when there is no usable one
+    def load_snapshot(self):
+        try:
+            with open(self.snapshot_file, 'rb') as f:
+                snapshot = pickle.load(f)
+        except Exception:
+            return {}
 
-        return extracted_documents, content_index, title_index, search_terms
+        if not isinstance(snapshot, dict) or snapshot.get('version') != SNAPSHOT_VERSION:
+            return {}
+        return snapshot
 
+    # Function to fingerprint every document by size, mtime and content hash. The hash is only recomputed
+    # for files whose size or mtime moved since the previous snapshot.
+    def document_signatures(self, previous_signatures):
+        signatures = {}
 
-    def extract_text_from_documents(self, file_path):
-        document = Document(file_path)
-        doc_data = {'title': "", 'author': "", 'content': ""}
+        for file_name in os.listdir(self.folder_path):
+            file_path = os.path.join(self.folder_path, file_name)
 
-        paragraphs = (p.text.strip() for p in document.paragraphs if p.text.strip())
-        for text in paragraphs:
-            if not doc_data['title']:
-                doc_data['title'] = text
-            elif text.startswith("Author:"):
-                doc_data['author'] = text[7:].strip()
+            if not (os.path.isfile(file_path) and file_name.endswith('.docx')):
+                continue
+
+            stat = os.stat(file_path)
+            previous = previous_signatures.get(file_name)
+            if previous and previous['size'] == stat.st_size and previous['mtime'] == stat.st_mtime_ns:
+                signatures[file_name] = previous
             else:
-                doc_data['content'] += f"{text}"
+                signatures[file_name] = {'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'hash': self.file_hash(file_path)}
+
+        return signatures
+
+    def file_hash(self, file_path):
+        digest = hashlib.sha1()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    # The snapshot index can be reused as is when the same files are there with the same content
+    def snapshot_is_current(self, snapshot, signatures):
+        previous_signatures = snapshot.get('signatures')
+        if previous_signatures is None or previous_signatures.keys() != signatures.keys():
+            return False
+        return all(previous_signatures[name]['hash'] == signature['hash'] for name, signature in signatures.items())
+
+    # Function to return the extracted documents of the snapshot whose file did not change, so only
+    # new and modified files go through python-docx again.
+    def cached_documents(self, snapshot, signatures):
+        previous_signatures = snapshot.get('signatures', {})
+        return {
+            file_name: doc for file_name, doc in snapshot.get('documents', {}).items()
+            if file_name in signatures and previous_signatures[file_name]['hash'] == signatures[file_name]['hash']
+        }
+
+    def save_snapshot(self, signatures, documents, index):
+        snapshot = {
+            'version': SNAPSHOT_VERSION,
+            'signatures': signatures,
+            'documents': {os.path.basename(doc['file_name']): doc for doc in documents},
+            'index': index
+        }
+
+        temp_file = f"{self.snapshot_file}.tmp"
+        try:
+            with open(temp_file, 'wb') as f:
+                pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_file, self.snapshot_file)
+        except (OSError, pickle.PicklingError) as e:
+            print(f"Error: could not write the index snapshot: {e}")
+
+    # Builds every index from the extracted documents, this tuple is what the snapshot stores
+    def build_search_index(self, extracted_documents):
+        extracted_fulltext = self.extract_fullContext_from_documents(extracted_documents)
+        extracted_titles = self.extract_titles_from_documents(extracted_documents)
+
+        content_index, search_terms = self.build_binary_index(extracted_fulltext)
+        title_index, _ = self.build_binary_index(extracted_titles)
 
-        return doc_data
+        return extracted_documents, dict(content_index), dict(title_index), search_terms
 
 
-    def document_extractor(self, folder_path):
+    def document_extractor(self, folder_path, cached_documents=None):
+        cached_documents = cached_documents or {}
         documents = []
 
-        for file_name in os.listdir(folder_path):
+        # Sorted, so doc ids do not depend on the order the filesystem lists the folder in
+        file_names = [
+            file_name for file_name in sorted(os.listdir(folder_path))
+            if os.path.isfile(os.path.join(folder_path, file_name)) and file_name.endswith('.docx')
+        ]
+        pending = [file_name for file_name in file_names if file_name not in cached_documents]
+        extracted = dict(zip(pending, self.extract_files([os.path.join(folder_path, file_name) for file_name in pending])))
+
+        self.extraction_errors = {}
+        for file_name in file_names:
             file_path = os.path.join(folder_path, file_name)
 
-            if not (os.path.isfile(file_path) and file_name.endswith('.docx')):
+            if file_name in cached_documents:
+                documents.append(cached_documents[file_name])
                 continue
-            
-            doc_data = self.extract_text_from_documents(file_path)
-            doc_data['file_name'] = file_path
 
+            doc_data, error = extracted[file_name]
+            if error is not None:
+                print(f"Error: could not extract {file_path}: {error}")
+                self.extraction_errors[file_name] = error
+                continue
+
+            doc_data['file_name'] = file_path
             documents.append(doc_data)
 
         return documents
 
+    # Function to parse the given files in order, fanned out over a process pool when there are enough of them
+    def extract_files(self, file_paths):
+        workers = self.extraction_workers or os.cpu_count() or 1
+        if workers < 2 or len(file_paths) < PARALLEL_EXTRACTION_THRESHOLD:
+            return [extract_document(file_path) for file_path in file_paths]
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(extract_document, file_paths, chunksize=max(1, len(file_paths) // (workers * 4))))
+
 
     def extract_fullContext_from_documents(self, documents):
         return [
@@ -89,10 +468,10 @@ class SearchEngine:
         for doc_id, content in enumerate(documents):
             words = self.preprocess_text(content.lower())
 
-            # Index individual words
+            # Index individual words, documents are visited in doc id order so every postings list
+            # comes out sorted and without duplicates, no need to scan it before appending
             for word in set(words):  # Use set to avoid duplicates in the same document
-                if doc_id not in index[word]['doc_ids']:
-                    index[word]['doc_ids'].append(doc_id)
+                index[word]['doc_ids'].append(doc_id)
                 search_terms[word] += 1
 
             # Index n-grams (phrases)
@@ -104,36 +483,164 @@ class SearchEngine:
         return index, search_terms
 
 
-    def dice_similarity(self, query_vector, doc_vector):
-        intersection = sum(query_vector[term] * doc_vector.get(term, 0) for term in query_vector)
-        total_terms = sum(query_vector.values()) + sum(doc_vector.values())
-        return (2 * intersection) / total_terms if total_terms != 0 else 0
-
-    # Convert query into a binary vector
-    def query_to_binary_vector(self, query, index):
-        query_terms = set(self.preprocess_text(query))
-        return {term: 1 if term in query_terms else 0 for term in index}
+    def compute_doc_sizes(self, index):
+        doc_sizes = defaultdict(int)
+        for data in index.values():
+            for doc_id in data['doc_ids']:
+                doc_sizes[doc_id] += 1
+        return dict(doc_sizes)
 
-    # Function to rank documents based on similarity
-    def rank_documents_bim(self, query, index):
-        query_vector = self.query_to_binary_vector(query, index)
-        ranked_docs = []
-
-        for doc_id in set(doc_id for term in query_vector for doc_id in index[term]['doc_ids']):
-            doc_vector = {term: 1 for term in index if doc_id in index[term]['doc_ids']}
-            similarity = self.dice_similarity(query_vector, doc_vector)
-            if similarity > 0:
-                ranked_docs.append((similarity, doc_id))
+    # Dice coefficient of two binary vectors, from the size of their overlap and their own sizes
+    def dice_similarity(self, intersection, query_size, doc_size):
+        total_terms = query_size + doc_size
+        return (2 * intersection) / total_terms if total_terms != 0 else 0
 
-        ranked_docs.sort(reverse=True, key=lambda x: x[0])
+    # Probabilistic BIM term weight without relevance information (Robertson/Sparck Jones with 0.5 smoothing),
+    # kept positive for terms in more than half of the documents like BM25 does
+    def bim_weight(self, index, term, num_documents):
+        doc_frequency = len(index[term]['doc_ids'])
+        return math.log(1 + (num_documents - doc_frequency + 0.5) / (doc_frequency + 0.5))
+
+    # Function to rank documents based on similarity. Only the postings of the query terms are read,
+    # the size of every document vector is precomputed in doc_sizes. The Rocchio expanded query of the
+    # keyword (see rocchio_query) re-ranks the matches when one is given.
+    def rank_documents_bim(self, query, index, doc_sizes, top_k=None, model='dice', expanded_query=None):
+        query_terms = set(self.preprocess_text(query)) & index.keys()
+
+        if expanded_query is not None:
+            scores = self.expanded_query_scores(query_terms, expanded_query, index, doc_sizes, model)
+        else:
+            if model == 'dice':
+                term_weights = {term: 1 for term in query_terms}
+            else:
+                term_weights = {term: self.bim_weight(index, term, len(doc_sizes)) for term in query_terms}
+
+            matches = defaultdict(int)
+            scores = defaultdict(float)
+            for term, weight in term_weights.items():
+                for doc_id in index[term]['doc_ids']:
+                    matches[doc_id] += 1
+                    scores[doc_id] += weight
+
+            if model == 'dice':
+                scores = {doc_id: self.dice_similarity(count, len(query_terms), doc_sizes[doc_id]) for doc_id, count in matches.items()}
+
+        if model == 'bm25':
+            # The index is binary, every tf is 1, so BM25 only adds its document length normalisation
+            average_size = sum(doc_sizes.values()) / len(doc_sizes)
+            for doc_id in scores:
+                length_norm = 1 - BM25_B + BM25_B * doc_sizes[doc_id] / average_size
+                scores[doc_id] *= (BM25_K1 + 1) / (1 + BM25_K1 * length_norm)
+
+        ranked_docs = [(score, doc_id) for doc_id, score in scores.items() if score > 0]
+        if top_k is not None:
+            # Bounded heap, same order as the full sort for the first k
+            ranked_docs = heapq.nsmallest(top_k, ranked_docs, key=lambda x: (-x[0], x[1]))
+        else:
+            ranked_docs.sort(key=lambda x: (-x[0], x[1]))
         return [doc_id for similarity, doc_id in ranked_docs]
 
-    # Function to search the documents based on a query
-    def search_query_bim(self, documents, index, query):
-        ranked_doc_ids = self.rank_documents_bim(query, index)
+    # Function to return {doc_id: sum of the squared BIM weights of its terms} for the documents of the index
+    def bim_doc_norm(self, index, doc_sizes):
+        norms = self.bim_doc_norms.get(id(index))
+        if norms is None:
+            norms = defaultdict(float)
+            for term, data in index.items():
+                weight = self.bim_weight(index, term, len(doc_sizes))
+                for doc_id in data['doc_ids']:
+                    norms[doc_id] += weight * weight
+            norms = self.bim_doc_norms[id(index)] = dict(norms)
+        return norms
+
+    # Function to score the documents matching the query terms with the expanded query. Query and documents are
+    # both vectors of BIM term weights: Dice is 2 q.d / (q.q + d.d), BIM and BM25 add up the expanded weights of
+    # the terms in the document. Feedback terms only re-rank the matches, they do not bring in other documents.
+    def expanded_query_scores(self, query_terms, expanded_query, index, doc_sizes, model):
+        matches = set()
+        for term in query_terms:
+            matches.update(index[term]['doc_ids'])
+
+        scores = defaultdict(float)
+        for term, weight in expanded_query.items():
+            doc_weight = self.bim_weight(index, term, len(doc_sizes)) if model == 'dice' else 1
+            for doc_id in index[term]['doc_ids']:
+                if doc_id in matches:
+                    scores[doc_id] += weight * doc_weight
+
+        if model == 'dice':
+            doc_norms = self.bim_doc_norm(index, doc_sizes)
+            query_norm = sum(weight * weight for weight in expanded_query.values())
+            return {doc_id: 2 * dot / (query_norm + doc_norms[doc_id]) for doc_id, dot in scores.items()}
+        return scores
+
+    # Function to build the Rocchio expanded query of a keyword from its feedback over the content index:
+    # alpha * query + beta * centroid of the relevant documents - gamma * centroid of the non-relevant ones,
+    # every vector holding the BIM weights of its terms. Feedback terms that are template labels, appear in too
+    # many documents or stay below ROCCHIO_MIN_WEIGHT_RATIO of the strongest query term are left out, and equal
+    # weights keep the order the terms first appear in the feedback documents. None without usable feedback.
+    def rocchio_query(self, query):
+        relevant = []
+        non_relevant = []
+        for doc_id, relevance in self.feedback_log.relevances(query):
+            if not str(doc_id).isdigit() or int(doc_id) >= len(self.documents):
+                continue
+            if relevance == "relevant":
+                relevant.append(int(doc_id))
+            elif relevance == "not-relevant":
+                non_relevant.append(int(doc_id))
+
+        index = self.content_index
+        query_terms = set(self.preprocess_text(query)) & index.keys()
+        if not query_terms or (not relevant and not non_relevant):
+            return None
+
+        num_documents = len(self.content_sizes)
+        weights = defaultdict(float)
+        for term in query_terms:
+            weights[term] += ROCCHIO_ALPHA * self.bim_weight(index, term, num_documents)
+        for doc_ids, factor in ((relevant, ROCCHIO_BETA), (non_relevant, -ROCCHIO_GAMMA)):
+            documents = self.extract_fullContext_from_documents([self.documents[doc_id] for doc_id in doc_ids])
+            for content in documents:
+                for term in dict.fromkeys(self.preprocess_text(content)):
+                    if term in index:
+                        weights[term] += factor * self.bim_weight(index, term, num_documents) / len(doc_ids)
+
+        min_weight = ROCCHIO_MIN_WEIGHT_RATIO * max(weights[term] for term in query_terms)
+        candidates = [
+            term for term, weight in weights.items()
+            if term not in query_terms and term not in ROCCHIO_TEMPLATE_TERMS and weight > min_weight
+            and len(index[term]['doc_ids']) <= ROCCHIO_MAX_DF_RATIO * num_documents and any(char.isalpha() for char in term)
+        ]
+        # Stable sort, equal weights stay in order of first appearance
+        feedback_terms = sorted(candidates, key=weights.get, reverse=True)[:ROCCHIO_EXPANSION_TERMS]
+        return {term: weights[term] for term in sorted(query_terms) + feedback_terms}
+
+    # Function to return the cached expanded query of a keyword, building it on a miss
+    def expanded_query(self, query):
+        with self.expansion_lock:
+            if query in self.expansion_cache:
+                self.expansion_cache.move_to_end(query)
+                return self.expansion_cache[query]
+            generation = self.feedback_generation
+
+        expanded_query = self.rocchio_query(query)
+
+        with self.expansion_lock:
+            if generation == self.feedback_generation:
+                self.expansion_cache[query] = expanded_query
+                if len(self.expansion_cache) > EXPANSION_CACHE_SIZE:
+                    self.expansion_cache.popitem(last=False)
+        return expanded_query
+
+    # Function to search the documents based on a query, only the requested page gets its snippets built.
+    # With use_feedback the content index is ranked with the Rocchio expanded query of the keyword.
+    def search_query_bim(self, documents, index, doc_sizes, query, offset=0, limit=None, model='dice', use_feedback=False):
+        top_k = offset + limit if limit is not None else None
+        expanded_query = self.expanded_query(query) if use_feedback and index is self.content_index else None
+        ranked_doc_ids = self.rank_documents_bim(query, index, doc_sizes, top_k, model, expanded_query)
         results = []
 
-        for rank, doc_id in enumerate(ranked_doc_ids, 1):
+        for rank, doc_id in enumerate(ranked_doc_ids[offset:], offset + 1):
             doc = documents[doc_id]
             snippet = f"{doc['content'][:180].rsplit(' ', 1)[0]}..." if len(doc['content']) > 100 else doc['content']
             results.append({
@@ -149,32 +656,23 @@ class SearchEngine:
 
     def suggest_keywords(self, input_text):
         input_text = input_text.lower()
-        suggestions = [term for term in self.search_terms if term.startswith(input_text)]
-        return sorted(suggestions, key=lambda x: self.search_terms[x], reverse=True)[:5]
+        return self.suggestion_trie.suggest(input_text, max_suggestions=5)
     
     def store_feedback(self, doc_id, keyword, relevance):
-        self.user_feedback[keyword][doc_id] = relevance
-
-        with open(self.feedback_file, 'w') as f:
-            json.dump(self.user_feedback, f)
+        self.feedback_log.append(doc_id, keyword, relevance)
+        with self.expansion_lock:
+            self.feedback_generation += 1
+            self.expansion_cache.pop(keyword, None)
 
     def load_feedback(self):
-        """ Load feedback from the JSON file if it exists. """
-        if os.path.exists(self.feedback_file):
-            with open(self.feedback_file, 'r') as f:
-                try:
-                    return json.load(f)
-                except json.JSONDecodeError:
-                    return defaultdict(lambda: defaultdict(bool))  # Return empty feedback if file is corrupted
-        return defaultdict(lambda: defaultdict(bool))
+        """ Load feedback from the JSON snapshot and replay the feedback log on top of it. """
+        return self.feedback_log.load()
 
     def get_feedback_for_keyword(self, keyword):
-        if keyword in self.user_feedback:
-            return [{"doc_id": doc_id, "relevance": relevance} for doc_id, relevance in self.user_feedback[keyword].items()]
-        return []
+        return [{"doc_id": doc_id, "relevance": relevance} for doc_id, relevance in self.feedback_log.relevances(keyword)]
 
     def evaluate_performance(self, query):
-        results = self.search_query_bim(self.documents, self.content_index, query)
+        results = self.search_query_bim(self.documents, self.content_index, self.content_sizes, query)
 
         relevant_docs = set()
         retrieved_docs = set()
@@ -194,10 +692,31 @@ class SearchEngine:
 
         return {'precision': precision, 'recall': recall, 'f1-score': f1_score}
 
+    # Function to evaluate one ranking model over every judged keyword at once, see evaluation.py
+    def evaluate_batch(self, model='dice', k=10, workers=4):
+        queries = judged_queries(self.feedback_log.judgments(), self.documents)
+        ranker = lambda query: [
+            os.path.basename(result['file_path'])
+            for result in self.search_query_bim(self.documents, self.content_index, self.content_sizes, query, model=model)
+        ]
+        return evaluate_run(ranker, queries, k, workers)
+
+
+
 
+# Worker processes of the extraction pool import this module too, only the main process builds the index
+search_engine = SearchEngine('Documents', 'feedback.json') if multiprocessing.parent_process() is None else None
 
+# Function to read the optional offset and limit (or k) parameters of a search, every search returns a bounded
+# page so only the top offset + limit documents are ranked in full
+def requested_page():
+    offset = int(request.args.get('offset', 0))
+    limit = int(request.args.get('k', request.args.get('limit', DEFAULT_PAGE_SIZE)))
+
+    if offset < 0 or not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"offset {offset} or limit {limit} out of range")
+    return offset, limit
 
-search_engine = SearchEngine('Documents', 'feedback.json')
 
 @app.route('/api/suggestions', methods=['GET'])
 def suggestions():
@@ -215,7 +734,16 @@ def search_author():
     if not query:
         return jsonify({"error": "Query parameter is required"}), 400
 
-    results = search_engine.search_query_bim(search_engine.documents, search_engine.title_index, query)
+    try:
+        offset, limit = requested_page()
+    except ValueError:
+        return jsonify({"error": f"offset must be 0 or more and limit between 1 and {MAX_PAGE_SIZE}"}), 400
+
+    model = request.args.get('model', 'dice')
+    if model not in RANKING_MODELS:
+        return jsonify({"error": f"model must be one of {', '.join(RANKING_MODELS)}"}), 400
+
+    results = search_engine.search_query_bim(search_engine.documents, search_engine.title_index, search_engine.title_sizes, query, offset, limit, model)
     return jsonify({"results": results})
 
 @app.route('/api/v3/search/content', methods=['GET'])
@@ -224,7 +752,18 @@ def search_content():
     if not query:
         return jsonify({"error": "Query parameter is required"}), 400
 
-    results = search_engine.search_query_bim(search_engine.documents, search_engine.content_index, query)
+    try:
+        offset, limit = requested_page()
+    except ValueError:
+        return jsonify({"error": f"offset must be 0 or more and limit between 1 and {MAX_PAGE_SIZE}"}), 400
+
+    model = request.args.get('model', 'dice')
+    if model not in RANKING_MODELS:
+        return jsonify({"error": f"model must be one of {', '.join(RANKING_MODELS)}"}), 400
+
+    # Rankings are re-weighted by the feedback of the keyword unless the request asks for feedback=false
+    use_feedback = request.args.get('feedback', 'true').lower() != 'false'
+    results = search_engine.search_query_bim(search_engine.documents, search_engine.content_index, search_engine.content_sizes, query, offset, limit, model, use_feedback)
     return jsonify({"results": results})
 
 @app.route('/api/v3/feedback', methods=['POST'])
@@ -247,10 +786,23 @@ def store_keyword_feedback():
 @app.route('/api/v3/evaluate', methods=['GET'])
 def evaluate_model():
     query = request.args.get('query', '')
-    if not query:
-        return jsonify({"error": "Query parameter is required"}), 400
+    if query:
+        results = search_engine.evaluate_performance(query)
+        return jsonify({"results": results})
+
+    # Without a query every judged keyword is evaluated against the chosen model
+    model = request.args.get('model', 'dice')
+    if model not in RANKING_MODELS:
+        return jsonify({"error": f"model must be one of {', '.join(RANKING_MODELS)}"}), 400
+
+    try:
+        k = int(request.args.get('k', 10))
+    except ValueError:
+        return jsonify({"error": "k must be a positive integer"}), 400
+    if k < 1:
+        return jsonify({"error": "k must be a positive integer"}), 400
 
-    results = search_engine.evaluate_performance(query)
+    results = search_engine.evaluate_batch(model, k)
     return jsonify({"results": results})
 
 
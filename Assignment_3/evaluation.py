@@ -0,0 +1,186 @@
+import os
+import sys
+import json
+import math
+import time
+import argparse
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Offline evaluation of the ranking models against the relevance judgments collected in feedback.json.
+# Every judged keyword is run as a query, the ranked files are scored with P@k, MAP, MRR and nDCG@k,
+# and the latency of every query is measured. Run from the repository root or from Assignment_3:
+#
+#   python Assignment_3/evaluation.py --models tfidf cosine bim nolm fuzzy --k 5
+
+REPOSITORY_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Ranking models by name: the assignment serving it and how to run one query against its search engine
+MODELS = {
+    'tfidf': ('Assignment_1', lambda engine, query: engine.search_query(query, engine.content_index, engine.doc_lengths, engine.extracted_documents, engine.content_terms, engine.content_bounds)),
+    'bm25f': ('Assignment_1', lambda engine, query: engine.search_bm25f(query)),
+    'cosine': ('Assignment_2', lambda engine, query: engine.search(query, engine.content_index, engine.content_norms, engine.content_terms, engine.content_bounds)),
+    'dice': ('Assignment_3', lambda engine, query: engine.search_query_bim(engine.documents, engine.content_index, engine.content_sizes, query)),
+    'bim': ('Assignment_3', lambda engine, query: engine.search_query_bim(engine.documents, engine.content_index, engine.content_sizes, query, model='bim')),
+    'bm25': ('Assignment_3', lambda engine, query: engine.search_query_bim(engine.documents, engine.content_index, engine.content_sizes, query, model='bm25')),
+    # Same models re-ranked with the Rocchio feedback of the keyword. The expansion is built from the judgments
+    # the queries are scored against, so these compare feedback on and off rather than measure unseen queries.
+    'dice_fb': ('Assignment_3', lambda engine, query: engine.search_query_bim(engine.documents, engine.content_index, engine.content_sizes, query, use_feedback=True)),
+    'bim_fb': ('Assignment_3', lambda engine, query: engine.search_query_bim(engine.documents, engine.content_index, engine.content_sizes, query, model='bim', use_feedback=True)),
+    'bm25_fb': ('Assignment_3', lambda engine, query: engine.search_query_bim(engine.documents, engine.content_index, engine.content_sizes, query, model='bm25', use_feedback=True)),
+    'nolm': ('Assignment_4', lambda engine, query: engine.search_query(query, engine.tf_idf, engine.documents)),
+    'fuzzy': ('Assignment_6', lambda engine, query: engine.search(query, engine.content_membership_degrees, 0.6)),
+}
+
+
+def precision_at_k(ranking, relevant, k):
+    return sum(1 for file_name in ranking[:k] if file_name in relevant) / k
+
+
+def average_precision(ranking, relevant):
+    hits = 0
+    total = 0
+    for rank, file_name in enumerate(ranking, 1):
+        if file_name in relevant:
+            hits += 1
+            total += hits / rank
+    return total / len(relevant)
+
+
+def reciprocal_rank(ranking, relevant):
+    for rank, file_name in enumerate(ranking, 1):
+        if file_name in relevant:
+            return 1 / rank
+    return 0
+
+
+# Binary gains, the ideal ranking puts every relevant file first
+def ndcg_at_k(ranking, relevant, k):
+    dcg = sum(1 / math.log2(rank + 1) for rank, file_name in enumerate(ranking[:k], 1) if file_name in relevant)
+    ideal = sum(1 / math.log2(rank + 1) for rank in range(1, min(len(relevant), k) + 1))
+    return dcg / ideal
+
+
+# Nearest-rank percentile of a list of numbers, fraction between 0 and 1
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[max(math.ceil(fraction * len(ordered)) - 1, 0)]
+
+
+# Function to turn the feedback ({keyword: {doc_id: relevance}}, doc ids of the Assignment_3 documents) into
+# {keyword: relevant file names}. Keywords without any relevant document cannot be scored and are left out.
+def judged_queries(feedback, documents):
+    queries = {}
+    for keyword, relevances in feedback.items():
+        relevant = set()
+        for doc_id, relevance in relevances.items():
+            if relevance == "relevant" and str(doc_id).isdigit() and int(doc_id) < len(documents):
+                relevant.add(os.path.basename(documents[int(doc_id)]['file_name']))
+        if relevant:
+            queries[keyword] = relevant
+    return queries
+
+
+# Function to run every judged query through ranker (query -> ranked file names) on a thread pool and
+# average the quality metrics over the queries. One untimed query goes first, so caches a model builds
+# on its first search (like the Assignment_1 TF-IDF matrix) do not count as query latency.
+def evaluate_run(ranker, queries, k=10, workers=4):
+    def run_query(query):
+        started = time.perf_counter()
+        ranking = ranker(query)
+        return ranking, (time.perf_counter() - started) * 1000
+
+    if queries:
+        ranker(next(iter(queries)))
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        runs = dict(zip(queries, executor.map(run_query, queries)))
+
+    if not runs:
+        return {'queries': 0}
+
+    latencies = [latency for _, latency in runs.values()]
+    average = lambda metric: sum(metric(runs[query][0], relevant) for query, relevant in queries.items()) / len(queries)
+
+    return {
+        'queries': len(queries),
+        f'P@{k}': average(lambda ranking, relevant: precision_at_k(ranking, relevant, k)),
+        'MAP': average(average_precision),
+        'MRR': average(reciprocal_rank),
+        f'nDCG@{k}': average(lambda ranking, relevant: ndcg_at_k(ranking, relevant, k)),
+        'latency_ms': {
+            'p50': percentile(latencies, 0.5),
+            'p90': percentile(latencies, 0.9),
+            'p99': percentile(latencies, 0.99),
+            'max': max(latencies)
+        }
+    }
+
+
+# Function to import the app.py of an assignment and return its search engine. The apps open their
+# Documents folder relative to the working directory, so the import runs from inside the assignment.
+def load_search_engine(folder):
+    path = os.path.join(REPOSITORY_ROOT, folder)
+    working_directory = os.getcwd()
+    sys.path.insert(0, path)
+    os.chdir(path)
+    try:
+        spec = importlib.util.spec_from_file_location(f"{folder.lower()}_app", os.path.join(path, 'app.py'))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    finally:
+        os.chdir(working_directory)
+        sys.path.remove(path)
+
+    # Assignment_1 watches its Documents folder, an evaluation run has no use for it
+    watcher = getattr(module, 'document_watcher', None)
+    if watcher is not None:
+        watcher.stop()
+    return module.search_engine
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate the ranking models against the relevance feedback of Assignment_3.")
+    parser.add_argument('--models', nargs='+', choices=sorted(MODELS), default=sorted(MODELS))
+    parser.add_argument('--k', type=int, default=10, help="cutoff of P@k and nDCG@k")
+    parser.add_argument('--workers', type=int, default=4, help="queries run in parallel")
+    parser.add_argument('--json', action='store_true', help="print the report as JSON")
+    args = parser.parse_args()
+
+    if args.k < 1 or args.workers < 1:
+        parser.error("--k and --workers must be at least 1")
+
+    engines = {'Assignment_3': load_search_engine('Assignment_3')}
+    judgments = engines['Assignment_3'].feedback_log.judgments()
+    queries = judged_queries(judgments, engines['Assignment_3'].documents)
+
+    report = {}
+    for model in args.models:
+        folder, search = MODELS[model]
+        if folder not in engines:
+            engines[folder] = load_search_engine(folder)
+        engine = engines[folder]
+
+        ranker = lambda query: [os.path.basename(result['file_path']) for result in search(engine, query)]
+        report[model] = evaluate_run(ranker, queries, args.k, args.workers)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"{len(queries)} judged queries")
+    print(f"{'model':<8} {'P@' + str(args.k):>7} {'MAP':>7} {'MRR':>7} {'nDCG@' + str(args.k):>8} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8}")
+    for model, scores in report.items():
+        if not scores['queries']:
+            print(f"{model:<8} no judged queries")
+            continue
+        latency = scores['latency_ms']
+        print(
+            f"{model:<8} {scores[f'P@{args.k}']:>7.3f} {scores['MAP']:>7.3f} {scores['MRR']:>7.3f} {scores[f'nDCG@{args.k}']:>8.3f} "
+            f"{latency['p50']:>8.2f} {latency['p90']:>8.2f} {latency['p99']:>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,375 @@
 import os
 import string
+import pickle
+import hashlib
+import multiprocessing
 import math
+import heapq
 from docx import Document
+from concurrent.futures import ProcessPoolExecutor
+from array import array
+from bisect import bisect_left
 from collections import defaultdict
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 
+try:
+    import numpy as np
+    from scipy.sparse import csr_matrix
+except ImportError:
+    np = None
+    csr_matrix = None
+
 
 app = Flask(__name__)
 CORS(app)
 
+# Bump whenever the layout of the pickled index changes, older snapshots are then rebuilt from the documents.
+SNAPSHOT_VERSION = 1
+
+# Below this many files to parse, starting worker processes costs more than it saves.
+PARALLEL_EXTRACTION_THRESHOLD = 16
+
+# Page of results a search endpoint returns when no limit is given, and the largest one it returns for one request.
+DEFAULT_PAGE_SIZE = 10
+MAX_PAGE_SIZE = 100
+
+
+
+# Function to extract doc_data from specific docx file
+def extract_text_from_documents(file_path):
+    document = Document(file_path)
+    doc_data = {'title': "", 'author': "", 'content': ""}
+
+    paragraphs = (p.text.strip() for p in document.paragraphs if p.text.strip())
+    for text in paragraphs:
+        if not doc_data['title']:
+            doc_data['title'] = text
+        elif text.startswith("Author:"):
+            doc_data['author'] = text[7:].strip()
+        else:
+            doc_data['content'] += f"{text}"
+
+    return doc_data
+
+
+# Process pool worker, kept at module level so it can be sent to the worker processes.
+# A broken file comes back as an error message instead of aborting the whole extraction.
+def extract_document(file_path):
+    try:
+        return extract_text_from_documents(file_path), None
+    except Exception as e:
+        return None, str(e)
+
+
+# Postings of one term: sorted doc ids and their term frequencies in two parallel typed arrays, about
+# 6 bytes per posting. Reads follow the dict interface ({doc_id: tf}) the scoring functions already use.
+class Postings:
+    __slots__ = ('doc_ids', 'tfs')
+
+    def __init__(self):
+        self.doc_ids = array('I')
+        self.tfs = array('H')
+
+    # Counts an occurrence while building, doc ids have to arrive in increasing order
+    def add(self, doc_id, count=1):
+        if self.doc_ids and self.doc_ids[-1] == doc_id:
+            self.set_tf(len(self.tfs) - 1, self.tfs[-1] + count)
+        else:
+            self.doc_ids.append(doc_id)
+            self.tfs.append(0)
+            self.set_tf(len(self.tfs) - 1, count)
+
+    # Widens the frequencies to 32 bits the first time one does not fit in 16
+    def set_tf(self, position, tf):
+        if tf > 0xFFFF and self.tfs.typecode == 'H':
+            self.tfs = array('I', self.tfs)
+        self.tfs[position] = tf
+
+    def find(self, doc_id):
+        position = bisect_left(self.doc_ids, doc_id)
+        if position < len(self.doc_ids) and self.doc_ids[position] == doc_id:
+            return position
+        return -1
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    def __contains__(self, doc_id):
+        return self.find(doc_id) >= 0
+
+    def __getitem__(self, doc_id):
+        position = self.find(doc_id)
+        if position < 0:
+            raise KeyError(doc_id)
+        return self.tfs[position]
+
+    def get(self, doc_id, default=None):
+        position = self.find(doc_id)
+        return self.tfs[position] if position >= 0 else default
+
+    def keys(self):
+        return self.doc_ids
+
+    def values(self):
+        return self.tfs
+
+    def items(self):
+        return zip(self.doc_ids, self.tfs)
+
+    # On-disk form: (doc id gap, tf) pairs as LEB128 varints
+    def to_bytes(self):
+        data = bytearray()
+        previous = 0
+        for doc_id, tf in zip(self.doc_ids, self.tfs):
+            for value in (doc_id - previous, tf):
+                while value >= 0x80:
+                    data.append((value & 0x7F) | 0x80)
+                    value >>= 7
+                data.append(value)
+            previous = doc_id
+        return bytes(data)
+
+    @classmethod
+    def from_bytes(cls, data):
+        postings = cls()
+        values = []
+        value = shift = 0
+        for byte in data:
+            value |= (byte & 0x7F) << shift
+            if byte & 0x80:
+                shift += 7
+                continue
+            values.append(value)
+            value = shift = 0
+
+        doc_id = 0
+        for position in range(0, len(values), 2):
+            doc_id += values[position]
+            postings.doc_ids.append(doc_id)
+            postings.tfs.append(0)
+            postings.set_tf(len(postings.tfs) - 1, values[position + 1])
+        return postings
+
+
+# Doc-term TF-IDF weights as a CSR matrix (one row per doc id, one column per term), so a query is scored
+# against every document with a single sparse mat-vec instead of a Python loop over the postings.
+class TfIdfMatrix:
+    # term_weights yields (term, doc ids, weights) for every term of the index
+    def __init__(self, term_weights, num_documents):
+        self.columns = {}
+        rows, columns, data = [np.zeros(0, dtype=np.int64)], [np.zeros(0, dtype=np.int64)], [np.zeros(0)]
+
+        for term, doc_ids, weights in term_weights:
+            column = self.columns.setdefault(term, len(self.columns))
+            rows.append(np.asarray(doc_ids, dtype=np.int64))
+            columns.append(np.full(len(doc_ids), column, dtype=np.int64))
+            data.append(np.asarray(weights, dtype=np.float64))
+
+        shape = (num_documents, len(self.columns))
+        self.matrix = csr_matrix((np.concatenate(data), (np.concatenate(rows), np.concatenate(columns))), shape=shape)
+        # Same structure with ones, a document that only matches terms weighted 0 is still a match
+        self.pattern = self.matrix.copy()
+        self.pattern.data = np.ones_like(self.pattern.data)
+
+    # Function to return (doc_id, score) of the matching documents, best first and ties by doc id,
+    # query_weights yields (term, weight) and repeated terms add up
+    def top_documents(self, query_weights, top_k=None):
+        query = np.zeros(len(self.columns))
+        matched = np.zeros(len(self.columns))
+        for term, weight in query_weights:
+            column = self.columns.get(term)
+            if column is not None:
+                query[column] += weight
+                matched[column] = 1
+
+        doc_ids = np.flatnonzero(self.pattern @ matched)
+        scores = (self.matrix @ query)[doc_ids]
+
+        if top_k is not None and top_k < len(doc_ids):
+            # Everything tied with the k-th best score survives, so the tie break below stays exact
+            kth = np.argpartition(-scores, top_k - 1)[top_k - 1]
+            keep = scores >= scores[kth]
+            doc_ids, scores = doc_ids[keep], scores[keep]
+
+        order = np.lexsort((doc_ids, -scores))[:top_k]
+        return [(int(doc_ids[i]), float(scores[i])) for i in order]
+
+
+# Compressed prefix trie over the suggestion terms. Every node caches its top-k terms by frequency,
+# so a lookup only walks the prefix and returns the cached list instead of scanning the vocabulary.
+class SuggestionTrie:
+    def __init__(self, search_terms, top_k=10):
+        self.top_k = top_k
+        self.search_terms = search_terms
+        self.rank = {term: rank for rank, term in enumerate(search_terms)}
+        self.root = self.build_node(sorted(search_terms), 0, len(search_terms), 0)
+
+    def sort_key(self, term):
+        return (-self.search_terms[term], self.rank[term])
+
+    # Builds the node for the sorted terms[lo:hi], which all share their first `depth` characters
+    def build_node(self, terms, lo, hi, depth):
+        node = {'label': "", 'children': {}, 'top': []}
+        if lo >= hi:
+            return node
+
+        first, last = terms[lo], terms[hi - 1]
+        end = depth
+        while end < min(len(first), len(last)) and first[end] == last[end]:
+            end += 1
+        node['label'] = first[depth:end]
+
+        candidates = []
+        if len(first) == end:
+            candidates.append(first)
+            lo += 1
+
+        while lo < hi:
+            char = terms[lo][end]
+            child_hi = lo + 1
+            while child_hi < hi and terms[child_hi][end] == char:
+                child_hi += 1
+            child = self.build_node(terms, lo, child_hi, end)
+            node['children'][char] = child
+            candidates.extend(child['top'])
+            lo = child_hi
+
+        node['top'] = sorted(candidates, key=self.sort_key)[:self.top_k]
+        return node
+
+    # Function to return the most frequent terms starting with the prefix
+    def suggest(self, prefix, max_suggestions=5):
+        node = self.root
+        position = 0
+
+        while True:
+            label = node['label']
+            remaining = prefix[position:]
+            if remaining.startswith(label) or label.startswith(remaining):
+                position += len(label)
+            else:
+                return []
+
+            if position >= len(prefix):
+                return node['top'][:max_suggestions]
+
+            node = node['children'].get(prefix[position])
+            if node is None:
+                return []
+
 
 
 class SearchEngine():
 
-    def __init__(self, folder_path='Documents'):
+    def __init__(self, folder_path='Documents', snapshot_file='index_snapshot.pkl', extraction_workers=None, vectorized_scoring=None):
+        if vectorized_scoring and csr_matrix is None:
+            raise ImportError("vectorized scoring needs numpy and scipy")
+
         self.folder_path = folder_path
+        self.snapshot_file = snapshot_file
+        self.extraction_workers = extraction_workers
+        self.extraction_errors = {}
         self.documents, self.tf_idf, self.search_terms = self.setup_search_engine(self.folder_path)
+        self.suggestion_trie = SuggestionTrie(self.search_terms)
+        # None picks the NumPy/SciPy scoring whenever both are installed
+        self.vectorized_scoring = csr_matrix is not None if vectorized_scoring is None else vectorized_scoring
+        self.tf_idf_matrix = self.build_tf_idf_matrix(self.tf_idf) if self.vectorized_scoring else None
 
 
+    # Function to load the indexes from the on-disk snapshot when the Documents folder did not change,
+    # otherwise only new and modified documents are parsed again before the indexes are rebuilt.
     def setup_search_engine(self, folder_path):
-        extracted_documents = self.document_extractor(folder_path)
-        
+        snapshot = self.load_snapshot()
+        signatures = self.document_signatures(snapshot.get('signatures', {}))
+
+        if self.snapshot_is_current(snapshot, signatures):
+            index = snapshot['index']
+        else:
+            index = self.build_search_index(self.document_extractor(folder_path, self.cached_documents(snapshot, signatures)))
+
+        # Files that failed to extract stay out of the snapshot, so they are retried on the next start
+        for file_name in self.extraction_errors:
+            signatures.pop(file_name, None)
+
+        if snapshot.get('signatures') != signatures:
+            self.save_snapshot(signatures, index[0], index)
+
+        return index
+
+    # Function to load the index snapshot written by a previous start, an empty dict when there is no usable one
+    def load_snapshot(self):
+        try:
+            with open(self.snapshot_file, 'rb') as f:
+                snapshot = pickle.load(f)
+        except Exception:
+            return {}
+
+        if not isinstance(snapshot, dict) or snapshot.get('version') != SNAPSHOT_VERSION:
+            return {}
+        return snapshot
+
+    # Function to fingerprint every document by size, mtime and content hash. The hash is only recomputed
+    # for files whose size or mtime moved since the previous snapshot.
+    def document_signatures(self, previous_signatures):
+        signatures = {}
+
+        for file_name in os.listdir(self.folder_path):
+            file_path = os.path.join(self.folder_path, file_name)
+
+            if not (os.path.isfile(file_path) and file_name.endswith('.docx')):
+                continue
+
+            stat = os.stat(file_path)
+            previous = previous_signatures.get(file_name)
+            if previous and previous['size'] == stat.st_size and previous['mtime'] == stat.st_mtime_ns:
+                signatures[file_name] = previous
+            else:
+                signatures[file_name] = {'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'hash': self.file_hash(file_path)}
+
+        return signatures
+
+    def file_hash(self, file_path):
+        digest = hashlib.sha1()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    # The snapshot index can be reused as is when the same files are there with the same content
+    def snapshot_is_current(self, snapshot, signatures):
+        previous_signatures = snapshot.get('signatures')
+        if previous_signatures is None or previous_signatures.keys() != signatures.keys():
+            return False
+        return all(previous_signatures[name]['hash'] == signature['hash'] for name, signature in signatures.items())
+
+    # Function to return the extracted documents of the snapshot whose file did not change, so only
+    # new and modified files go through python-docx again.
+    def cached_documents(self, snapshot, signatures):
+        previous_signatures = snapshot.get('signatures', {})
+        return {
+            file_name: doc for file_name, doc in snapshot.get('documents', {}).items()
+            if file_name in signatures and previous_signatures[file_name]['hash'] == signatures[file_name]['hash']
+        }
+
+    def save_snapshot(self, signatures, documents, index):
+        snapshot = {
+            'version': SNAPSHOT_VERSION,
+            'signatures': signatures,
+            'documents': {os.path.basename(doc['file_name']): doc for doc in documents},
+            'index': index
+        }
+
+        temp_file = f"{self.snapshot_file}.tmp"
+        try:
+            with open(temp_file, 'wb') as f:
+                pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_file, self.snapshot_file)
+        except (OSError, pickle.PicklingError) as e:
+            print(f"Error: could not write the index snapshot: {e}")
+
+    # Builds every index from the extracted documents, this tuple is what the snapshot stores
+    def build_search_index(self, extracted_documents):
         index, doc_lengths, search_terms = self.build_index(extracted_documents)
 
         idf = self.compute_idf(index, len(extracted_documents))
@@ -30,36 +378,46 @@ class SearchEngine():
         return extracted_documents, tf_idf, search_terms
 
 
-    def extract_text_from_documents(self, file_path):
-        document = Document(file_path)
-        doc_data = {'title': "", 'author': "", 'content': ""}
-
-        paragraphs = (p.text.strip() for p in document.paragraphs if p.text.strip())
-        for text in paragraphs:
-            if not doc_data['title']:
-                doc_data['title'] = text
-            elif text.startswith("Author:"):
-                doc_data['author'] = text[7:].strip()
-            else:
-                doc_data['content'] += f"{text}"
-
-        return doc_data
     
-    def document_extractor(self, folder_path):
+    def document_extractor(self, folder_path, cached_documents=None):
+        cached_documents = cached_documents or {}
         documents = []
 
-        for file_name in os.listdir(folder_path):
+        # Sorted, so doc ids do not depend on the order the filesystem lists the folder in
+        file_names = [
+            file_name for file_name in sorted(os.listdir(folder_path))
+            if os.path.isfile(os.path.join(folder_path, file_name)) and file_name.endswith('.docx')
+        ]
+        pending = [file_name for file_name in file_names if file_name not in cached_documents]
+        extracted = dict(zip(pending, self.extract_files([os.path.join(folder_path, file_name) for file_name in pending])))
+
+        self.extraction_errors = {}
+        for file_name in file_names:
             file_path = os.path.join(folder_path, file_name)
 
-            if not (os.path.isfile(file_path) and file_name.endswith('.docx')):
+            if file_name in cached_documents:
+                documents.append(cached_documents[file_name])
+                continue
+
+            doc_data, error = extracted[file_name]
+            if error is not None:
+                print(f"Error: could not extract {file_path}: {error}")
+                self.extraction_errors[file_name] = error
                 continue
-            
-            doc_data = self.extract_text_from_documents(file_path)
-            doc_data['file_name'] = file_path
 
+            doc_data['file_name'] = file_path
             documents.append(doc_data)
 
         return documents
+
+    # Function to parse the given files in order, fanned out over a process pool when there are enough of them
+    def extract_files(self, file_paths):
+        workers = self.extraction_workers or os.cpu_count() or 1
+        if workers < 2 or len(file_paths) < PARALLEL_EXTRACTION_THRESHOLD:
+            return [extract_document(file_path) for file_path in file_paths]
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(extract_document, file_paths, chunksize=max(1, len(file_paths) // (workers * 4))))
     
     # Preprocess the text by removing stopwords
     def preprocess_text(self, text):
@@ -69,7 +427,7 @@ class SearchEngine():
 
     # Build index for documents
     def build_index(self, documents):
-        index = defaultdict(lambda: {'doc_ids': set(), 'tf': {}})
+        index = defaultdict(Postings)
         doc_lengths = {}
         search_terms = defaultdict(int)
 
@@ -80,34 +438,39 @@ class SearchEngine():
 
             for i in range(len(words)):
                 word = words[i]
-                if doc_id not in index[word]['tf']:
-                    index[word]['tf'][doc_id] = 0
-                index[word]['tf'][doc_id] += 1
-                index[word]['doc_ids'].add(doc_id)
+                index[word].add(doc_id)
                 search_terms[word] += 1
 
+                # Phrases only feed the suggestions, only single words are ever looked up in the index
                 for j in range(i + 1, min(i + 5, len(words) + 1)):
                     phrase = " ".join(words[i:j])
                     search_terms[phrase] += 1
-                    index[phrase]['doc_ids'].add(doc_id)
 
         return index, doc_lengths, search_terms
 
     # Compute IDF (Inverse Document Frequency)
     def compute_idf(self, index, num_documents):
-        return {word: math.log(num_documents / (1 + len(data['doc_ids']))) for word, data in index.items()}
+        return {word: math.log(num_documents / (1 + len(data))) for word, data in index.items()}
 
     # Compute TF-IDF (Term Frequency-Inverse Document Frequency)
     def compute_tf_idf(self, index, idf, doc_lengths):
         return {
-            word: {doc_id: (tf / doc_lengths[doc_id]) * idf[word] for doc_id, tf in data['tf'].items()}
+            word: {doc_id: (tf / doc_lengths[doc_id]) * idf[word] for doc_id, tf in data.items()}
             for word, data in index.items()
         }
 
-    
-    # Search function for querying documents (with NOLM)
-    def search_query(self, query, tf_idf, documents):
+    # Build the CSR form of the TF-IDF weights used by the vectorized scoring
+    def build_tf_idf_matrix(self, tf_idf):
+        term_weights = ((term, list(weights.keys()), list(weights.values())) for term, weights in tf_idf.items())
+        return TfIdfMatrix(term_weights, len(self.documents))
+
+    # Rank documents matching any query term, (doc_id, score) best first and ties by doc id
+    def rank_documents(self, query, tf_idf, top_k=None):
         query_keywords = self.preprocess_text(query)
+
+        if self.vectorized_scoring and tf_idf is self.tf_idf:
+            return self.tf_idf_matrix.top_documents(((term, 1) for term in query_keywords), top_k)
+
         term_docs = {term: set(tf_idf[term].keys()) for term in query_keywords if term in tf_idf}
 
         # Combine lists for non-overlapping results
@@ -124,11 +487,18 @@ class SearchEngine():
                 ranked_docs.append((doc_id, score))
                 seen_docs.add(doc_id)
 
-        ranked_docs.sort(key=lambda x: x[1], reverse=True)
+        if top_k is not None:
+            return heapq.nsmallest(top_k, ranked_docs, key=lambda x: (-x[1], x[0]))
+        return sorted(ranked_docs, key=lambda x: (-x[1], x[0]))
 
-        # Generate results
+    # Search function for querying documents (with NOLM)
+    def search_query(self, query, tf_idf, documents, offset=0, limit=None):
+        top_k = offset + limit if limit is not None else None
+        ranked_docs = self.rank_documents(query, tf_idf, top_k)
+
+        # Generate results, only for the requested page
         result = []
-        for doc_id, _ in ranked_docs:
+        for doc_id, _ in ranked_docs[offset:]:
             doc = documents[doc_id]
             snippet = f"{doc['content'][:180].rsplit(' ', 1)[0]}..." if len(doc['content']) > 100 else doc['content']
             result.append({'title': doc['title'], 'author': doc['author'], 'snippet': snippet.replace("Abstract", ""), 'file_path': doc['file_name']})
@@ -138,12 +508,23 @@ class SearchEngine():
 
     def suggest_keywords(self, input_text):
         input_text = input_text.lower()
-        suggestions = [term for term in self.search_terms if term.startswith(input_text)]
-        return sorted(suggestions, key=lambda x: self.search_terms[x], reverse=True)[:5]
+        return self.suggestion_trie.suggest(input_text, max_suggestions=5)
+
 
 
+# Worker processes of the extraction pool import this module too, only the main process builds the index
+search_engine = SearchEngine('Documents') if multiprocessing.parent_process() is None else None
+
+# Function to read the optional offset and limit (or k) parameters of a search, every search returns a bounded
+# page so only the top offset + limit documents are ranked in full
+def requested_page():
+    offset = int(request.args.get('offset', 0))
+    limit = int(request.args.get('k', request.args.get('limit', DEFAULT_PAGE_SIZE)))
+
+    if offset < 0 or not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"offset {offset} or limit {limit} out of range")
+    return offset, limit
 
-search_engine = SearchEngine('Documents')
 
 @app.route('/api/v4/suggestions', methods=['GET'])
 def suggestions():
@@ -160,7 +541,12 @@ def search():
     if not query:
         return jsonify({"error": "Query parameter is required"}), 400
 
-    results = search_engine.search_query(query, search_engine.tf_idf, search_engine.documents)
+    try:
+        offset, limit = requested_page()
+    except ValueError:
+        return jsonify({"error": f"offset must be 0 or more and limit between 1 and {MAX_PAGE_SIZE}"}), 400
+
+    results = search_engine.search_query(query, search_engine.tf_idf, search_engine.documents, offset, limit)
     return jsonify({"results": results})
 
 
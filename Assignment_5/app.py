@@ -1,8 +1,14 @@
 import os
 import string
+import pickle
+import hashlib
+import multiprocessing
 import difflib
-import networkx as nx
+import heapq
+from array import array
 from docx import Document
+from concurrent.futures import ProcessPoolExecutor
+from collections import defaultdict
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 
@@ -10,53 +16,464 @@ from flask_cors import CORS
 app = Flask(__name__)
 CORS(app)
 
+# Bump whenever the layout of the pickled index changes, older snapshots are then rebuilt from the documents.
+SNAPSHOT_VERSION = 3
+
+# Below this many files to parse, starting worker processes costs more than it saves.
+PARALLEL_EXTRACTION_THRESHOLD = 16
+
+# Page of results a search endpoint returns when no limit is given, and the largest one it returns for one request.
+DEFAULT_PAGE_SIZE = 10
+MAX_PAGE_SIZE = 100
+
+# Fuzzy term lookups only consider terms within this many edits (Damerau-Levenshtein, adjacent
+# transpositions count as one edit). The deletion index is built from the first SYMSPELL_PREFIX_LENGTH
+# characters of every term, which bounds its size on large vocabularies.
+MAX_EDIT_DISTANCE = 2
+SYMSPELL_PREFIX_LENGTH = 7
+
+
+
+# Function to extract doc_data from specific docx file
+def extract_text_from_documents(file_path):
+    document = Document(file_path)
+    doc_data = {'title': "", 'author': "", 'content': ""}
+
+    paragraphs = (p.text.strip() for p in document.paragraphs if p.text.strip())
+    for text in paragraphs:
+        if not doc_data['title']:
+            doc_data['title'] = text
+        elif text.startswith("Author:"):
+            doc_data['author'] = text[7:].strip()
+        else:
+            doc_data['content'] += f"{text}"
+
+    return doc_data
+
+
+# Process pool worker, kept at module level so it can be sent to the worker processes.
+# A broken file comes back as an error message instead of aborting the whole extraction.
+def extract_document(file_path):
+    try:
+        return extract_text_from_documents(file_path), None
+    except Exception as e:
+        return None, str(e)
+
+
+# Compressed prefix trie over the suggestion terms. Every node caches its top-k terms by frequency,
+# so a lookup only walks the prefix and returns the cached list instead of scanning the vocabulary.
+class SuggestionTrie:
+    def __init__(self, search_terms, top_k=10):
+        self.top_k = top_k
+        self.search_terms = search_terms
+        self.rank = {term: rank for rank, term in enumerate(search_terms)}
+        self.root = self.build_node(sorted(search_terms), 0, len(search_terms), 0)
+
+    def sort_key(self, term):
+        return (-self.search_terms[term], self.rank[term])
+
+    # Builds the node for the sorted terms[lo:hi], which all share their first `depth` characters
+    def build_node(self, terms, lo, hi, depth):
+        node = {'label': "", 'children': {}, 'top': []}
+        if lo >= hi:
+            return node
+
+        first, last = terms[lo], terms[hi - 1]
+        end = depth
+        while end < min(len(first), len(last)) and first[end] == last[end]:
+            end += 1
+        node['label'] = first[depth:end]
+
+        candidates = []
+        if len(first) == end:
+            candidates.append(first)
+            lo += 1
+
+        while lo < hi:
+            char = terms[lo][end]
+            child_hi = lo + 1
+            while child_hi < hi and terms[child_hi][end] == char:
+                child_hi += 1
+            child = self.build_node(terms, lo, child_hi, end)
+            node['children'][char] = child
+            candidates.extend(child['top'])
+            lo = child_hi
+
+        node['top'] = sorted(candidates, key=self.sort_key)[:self.top_k]
+        return node
+
+    # Function to return the most frequent terms starting with the prefix
+    def suggest(self, prefix, max_suggestions=5):
+        node = self.root
+        position = 0
+
+        while True:
+            label = node['label']
+            remaining = prefix[position:]
+            if remaining.startswith(label) or label.startswith(remaining):
+                position += len(label)
+            else:
+                return []
+
+            if position >= len(prefix):
+                return node['top'][:max_suggestions]
+
+            node = node['children'].get(prefix[position])
+            if node is None:
+                return []
+
+
+
+# Bipartite term-document graph of the proximal nodes model as two CSR adjacencies: term id -> doc ids
+# and doc id -> term ids, each an offsets array into one flat array of ids. Terms are kept sorted, so the
+# term list for fuzzy matching is built once instead of on every query. Every term -> doc edge also has
+# the positions of the term in the document, as LEB128 varint gaps in one flat byte buffer.
+class ProximityIndex:
+    def __init__(self, document_tokens):
+        self.terms = sorted(set().union(*document_tokens))
+        self.term_ids = {term: term_id for term_id, term in enumerate(self.terms)}
+
+        self.doc_offsets = array('I', [0])
+        self.doc_term_ids = array('I')
+        document_positions = []
+        counts = [0] * len(self.terms)
+        for tokens in document_tokens:
+            positions = defaultdict(list)
+            for position, token in enumerate(tokens):
+                positions[self.term_ids[token]].append(position)
+
+            term_ids = sorted(positions)
+            self.doc_term_ids.extend(term_ids)
+            self.doc_offsets.append(len(self.doc_term_ids))
+            document_positions.append(positions)
+            for term_id in term_ids:
+                counts[term_id] += 1
+
+        self.term_offsets = array('I', [0])
+        for count in counts:
+            self.term_offsets.append(self.term_offsets[-1] + count)
+
+        # Documents are visited in doc id order, so the doc ids of every term come out sorted
+        self.term_doc_ids = array('I', bytes(4 * len(self.doc_term_ids)))
+        edge_positions = [b''] * len(self.doc_term_ids)
+        next_slot = list(self.term_offsets[:-1])
+        for doc_id, positions in enumerate(document_positions):
+            for term_id in self.doc_term_ids[self.doc_offsets[doc_id]:self.doc_offsets[doc_id + 1]]:
+                self.term_doc_ids[next_slot[term_id]] = doc_id
+                edge_positions[next_slot[term_id]] = self.encode_positions(positions[term_id])
+                next_slot[term_id] += 1
+
+        self.position_offsets = array('I', [0])
+        for data in edge_positions:
+            self.position_offsets.append(self.position_offsets[-1] + len(data))
+        self.positions = b''.join(edge_positions)
+
+    @staticmethod
+    def encode_positions(positions):
+        data = bytearray()
+        previous = 0
+        for position in positions:
+            value = position - previous
+            while value >= 0x80:
+                data.append((value & 0x7F) | 0x80)
+                value >>= 7
+            data.append(value)
+            previous = position
+        return bytes(data)
+
+    # The snapshot keeps the sorted terms and the raw bytes of the arrays
+    def to_snapshot(self):
+        arrays = (self.doc_offsets, self.doc_term_ids, self.term_offsets, self.term_doc_ids, self.position_offsets)
+        return (self.terms, self.positions) + tuple(values.tobytes() for values in arrays)
+
+    @classmethod
+    def from_snapshot(cls, state):
+        proximity_index = cls.__new__(cls)
+        proximity_index.terms, proximity_index.positions = state[:2]
+        proximity_index.term_ids = {term: term_id for term_id, term in enumerate(proximity_index.terms)}
+        (proximity_index.doc_offsets, proximity_index.doc_term_ids, proximity_index.term_offsets,
+         proximity_index.term_doc_ids, proximity_index.position_offsets) = (array('I', data) for data in state[2:])
+        return proximity_index
+
+    def __contains__(self, term):
+        return term in self.term_ids
+
+    # Function to return the doc ids of the documents containing the term, an empty array for unknown terms
+    def term_documents(self, term):
+        term_id = self.term_ids.get(term)
+        if term_id is None:
+            return array('I')
+        return self.term_doc_ids[self.term_offsets[term_id]:self.term_offsets[term_id + 1]]
+
+    # Function to return (doc_id, edge) for every document containing the term, edge is what term_positions decodes
+    def term_edges(self, term):
+        term_id = self.term_ids.get(term)
+        if term_id is None:
+            return []
+        start, end = self.term_offsets[term_id], self.term_offsets[term_id + 1]
+        return zip(self.term_doc_ids[start:end], range(start, end))
+
+    # Function to decode the sorted positions of a term in a document
+    def term_positions(self, edge):
+        positions = []
+        position = value = shift = 0
+        for byte in self.positions[self.position_offsets[edge]:self.position_offsets[edge + 1]]:
+            value |= (byte & 0x7F) << shift
+            if byte & 0x80:
+                shift += 7
+                continue
+            position += value
+            positions.append(position)
+            value = shift = 0
+        return positions
+
+    # Function to return the terms of a document
+    def document_terms(self, doc_id):
+        return [self.terms[term_id] for term_id in self.doc_term_ids[self.doc_offsets[doc_id]:self.doc_offsets[doc_id + 1]]]
+
+
+# Function to return the edit distance of two terms with adjacent transpositions as one edit (optimal string
+# alignment), or max_distance + 1 as soon as it is known to be larger than max_distance
+def edit_distance(first, second, max_distance):
+    if abs(len(first) - len(second)) > max_distance:
+        return max_distance + 1
+
+    # A common prefix or suffix does not change the distance, most candidates share a long prefix with the query
+    start = 0
+    while start < len(first) and start < len(second) and first[start] == second[start]:
+        start += 1
+    end = 0
+    while end < len(first) - start and end < len(second) - start and first[-1 - end] == second[-1 - end]:
+        end += 1
+    first, second = first[start:len(first) - end], second[start:len(second) - end]
+    if not first or not second:
+        return len(first) + len(second)
+
+    # Only the cells within max_distance of the diagonal can stay within max_distance, the others hold max_distance + 1
+    too_far = max_distance + 1
+    previous_row = None
+    row = [min(j, too_far) for j in range(len(second) + 1)]
+    for i in range(1, len(first) + 1):
+        previous_row, before_row, row = row, previous_row, [min(i, too_far)] + [too_far] * len(second)
+        for j in range(max(1, i - max_distance), min(len(second), i + max_distance) + 1):
+            cost = 0 if first[i - 1] == second[j - 1] else 1
+            row[j] = min(previous_row[j] + 1, row[j - 1] + 1, previous_row[j - 1] + cost, too_far)
+            if i > 1 and j > 1 and first[i - 1] == second[j - 2] and first[i - 2] == second[j - 1]:
+                row[j] = min(row[j], before_row[j - 2] + 1)
+        if min(row) > max_distance:
+            return too_far
+    return row[-1]
+
+
+# SymSpell style deletion dictionary over the vocabulary: every string reachable from the prefix of a term by
+# deleting up to max_distance characters points back to the term. Two terms within max_distance edits share
+# such a deletion, so a lookup only generates the deletions of the query instead of scanning every term.
+class FuzzyTermIndex:
+    def __init__(self, terms, max_distance=MAX_EDIT_DISTANCE, prefix_length=SYMSPELL_PREFIX_LENGTH):
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self.deletions = defaultdict(list)
+        for term in terms:
+            for deletion in self.generate_deletions(term):
+                self.deletions[deletion].append(term)
+
+    # Function to return the prefix of the term and every string left after deleting up to max_distance of its characters
+    def generate_deletions(self, term):
+        deletions = {term[:self.prefix_length]}
+        frontier = deletions
+        for _ in range(self.max_distance):
+            frontier = {candidate[:i] + candidate[i + 1:] for candidate in frontier for i in range(len(candidate))}
+            deletions |= frontier
+        return deletions
+
+    # Function to return the terms within max_distance edits of the query term
+    def lookup(self, query_term, max_distance=None):
+        max_distance = self.max_distance if max_distance is None else min(max_distance, self.max_distance)
+        candidates = set()
+        for deletion in self.generate_deletions(query_term):
+            candidates.update(self.deletions.get(deletion, ()))
+        return [term for term in candidates if edit_distance(query_term, term, max_distance) <= max_distance]
+
+
+# Function to return the length of the shortest window of token positions holding one position from every
+# list. The lists are sorted, they are merged through a heap holding the current position of every list.
+def minimal_window(position_lists):
+    heap = [(positions[0], list_id, 0) for list_id, positions in enumerate(position_lists)]
+    heapq.heapify(heap)
+    window_end = max(position for position, _, _ in heap)
+    best = window_end - heap[0][0] + 1
+
+    while True:
+        position, list_id, index = heapq.heappop(heap)
+        best = min(best, window_end - position + 1)
+        if index + 1 == len(position_lists[list_id]):
+            return best
+
+        next_position = position_lists[list_id][index + 1]
+        window_end = max(window_end, next_position)
+        heapq.heappush(heap, (next_position, list_id, index + 1))
 
 
 class SearchEngine():
 
-    def __init__(self, folder_path='Documents'):
+    def __init__(self, folder_path='Documents', snapshot_file='index_snapshot.pkl', extraction_workers=None):
         self.folder_path = folder_path
-        self.documents, self.graph = self.setup_search_engine(self.folder_path)
-        self.search_terms = self.build_term_repository(self.documents)
+        self.snapshot_file = snapshot_file
+        self.extraction_workers = extraction_workers
+        self.extraction_errors = {}
+        self.documents, self.proximity_index, self.search_terms = self.setup_search_engine(self.folder_path)
+        self.suggestion_trie = SuggestionTrie(self.search_terms)
+        self.fuzzy_index = FuzzyTermIndex(self.proximity_index.terms)
 
 
+    # Function to load the indexes from the on-disk snapshot when the Documents folder did not change,
+    # otherwise only new and modified documents are parsed again before the indexes are rebuilt.
     def setup_search_engine(self, folder_path):
-        extracted_documents = self.document_extractor(folder_path)
-        graph = self.build_proximity_graph(extracted_documents)
+        snapshot = self.load_snapshot()
+        signatures = self.document_signatures(snapshot.get('signatures', {}))
+
+        if self.snapshot_is_current(snapshot, signatures):
+            index = self.decode_snapshot_index(snapshot['index'])
+        else:
+            index = self.build_search_index(self.document_extractor(folder_path, self.cached_documents(snapshot, signatures)))
+
+        # Files that failed to extract stay out of the snapshot, so they are retried on the next start
+        for file_name in self.extraction_errors:
+            signatures.pop(file_name, None)
 
-        return extracted_documents, graph
+        if snapshot.get('signatures') != signatures:
+            self.save_snapshot(signatures, index[0], self.encode_snapshot_index(index))
 
+        return index
 
-    def extract_text_from_documents(self, file_path):
-        document = Document(file_path)
-        doc_data = {'title': "", 'author': "", 'content': ""}
+    # Function to load the index snapshot written by a previous start, an empty dict when there is no usable one
+    def load_snapshot(self):
+        try:
+            with open(self.snapshot_file, 'rb') as f:
+                snapshot = pickle.load(f)
+        except Exception:
+            return {}
 
-        paragraphs = (p.text.strip() for p in document.paragraphs if p.text.strip())
-        for text in paragraphs:
-            if not doc_data['title']:
-                doc_data['title'] = text
-            elif text.startswith("Author:"):
-                doc_data['author'] = text[7:].strip()
+        if not isinstance(snapshot, dict) or snapshot.get('version') != SNAPSHOT_VERSION:
+            return {}
+        return snapshot
+
+    # Function to fingerprint every document by size, mtime and content hash. The hash is only recomputed
+    # for files whose size or mtime moved since the previous snapshot.
+    def document_signatures(self, previous_signatures):
+        signatures = {}
+
+        for file_name in os.listdir(self.folder_path):
+            file_path = os.path.join(self.folder_path, file_name)
+
+            if not (os.path.isfile(file_path) and file_name.endswith('.docx')):
+                continue
+
+            stat = os.stat(file_path)
+            previous = previous_signatures.get(file_name)
+            if previous and previous['size'] == stat.st_size and previous['mtime'] == stat.st_mtime_ns:
+                signatures[file_name] = previous
             else:
-                doc_data['content'] += f"{text}"
+                signatures[file_name] = {'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'hash': self.file_hash(file_path)}
+
+        return signatures
+
+    def file_hash(self, file_path):
+        digest = hashlib.sha1()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    # The snapshot index can be reused as is when the same files are there with the same content
+    def snapshot_is_current(self, snapshot, signatures):
+        previous_signatures = snapshot.get('signatures')
+        if previous_signatures is None or previous_signatures.keys() != signatures.keys():
+            return False
+        return all(previous_signatures[name]['hash'] == signature['hash'] for name, signature in signatures.items())
+
+    # Function to return the extracted documents of the snapshot whose file did not change, so only
+    # new and modified files go through python-docx again.
+    def cached_documents(self, snapshot, signatures):
+        previous_signatures = snapshot.get('signatures', {})
+        return {
+            file_name: doc for file_name, doc in snapshot.get('documents', {}).items()
+            if file_name in signatures and previous_signatures[file_name]['hash'] == signatures[file_name]['hash']
+        }
+
+    def save_snapshot(self, signatures, documents, index):
+        snapshot = {
+            'version': SNAPSHOT_VERSION,
+            'signatures': signatures,
+            'documents': {os.path.basename(doc['file_name']): doc for doc in documents},
+            'index': index
+        }
+
+        temp_file = f"{self.snapshot_file}.tmp"
+        try:
+            with open(temp_file, 'wb') as f:
+                pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_file, self.snapshot_file)
+        except (OSError, pickle.PicklingError) as e:
+            print(f"Error: could not write the index snapshot: {e}")
+
+    # The snapshot keeps the proximity index as plain arrays
+    def encode_snapshot_index(self, index):
+        documents, proximity_index, search_terms = index
+        return documents, proximity_index.to_snapshot(), search_terms
+
+    def decode_snapshot_index(self, index):
+        documents, proximity_index, search_terms = index
+        return documents, ProximityIndex.from_snapshot(proximity_index), search_terms
+
+    # Builds every index from the extracted documents, this tuple is what the snapshot stores
+    def build_search_index(self, extracted_documents):
+        proximity_index = self.build_proximity_index(extracted_documents)
+        search_terms = self.build_term_repository(extracted_documents)
+
+        return extracted_documents, proximity_index, search_terms
+
 
-        return doc_data
     
-    def document_extractor(self, folder_path):
+    def document_extractor(self, folder_path, cached_documents=None):
+        cached_documents = cached_documents or {}
         documents = []
 
-        for file_name in os.listdir(folder_path):
+        # Sorted, so doc ids do not depend on the order the filesystem lists the folder in
+        file_names = [
+            file_name for file_name in sorted(os.listdir(folder_path))
+            if os.path.isfile(os.path.join(folder_path, file_name)) and file_name.endswith('.docx')
+        ]
+        pending = [file_name for file_name in file_names if file_name not in cached_documents]
+        extracted = dict(zip(pending, self.extract_files([os.path.join(folder_path, file_name) for file_name in pending])))
+
+        self.extraction_errors = {}
+        for file_name in file_names:
             file_path = os.path.join(folder_path, file_name)
 
-            if not (os.path.isfile(file_path) and file_name.endswith('.docx')):
+            if file_name in cached_documents:
+                documents.append(cached_documents[file_name])
                 continue
-            
-            doc_data = self.extract_text_from_documents(file_path)
-            doc_data['file_name'] = file_path
 
+            doc_data, error = extracted[file_name]
+            if error is not None:
+                print(f"Error: could not extract {file_path}: {error}")
+                self.extraction_errors[file_name] = error
+                continue
+
+            doc_data['file_name'] = file_path
             documents.append(doc_data)
 
         return documents
+
+    # Function to parse the given files in order, fanned out over a process pool when there are enough of them
+    def extract_files(self, file_paths):
+        workers = self.extraction_workers or os.cpu_count() or 1
+        if workers < 2 or len(file_paths) < PARALLEL_EXTRACTION_THRESHOLD:
+            return [extract_document(file_path) for file_path in file_paths]
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(extract_document, file_paths, chunksize=max(1, len(file_paths) // (workers * 4))))
     
     # Preprocess the text by removing stopwords
     def preprocess_text(self, text):
@@ -64,51 +481,67 @@ class SearchEngine():
         translator = str.maketrans('', '', string.punctuation)
         return [word for word in text.lower().translate(translator).split() if word not in stopwords]
 
-    # Build proximity graph
-    def build_proximity_graph(self, documents):
-        graph = nx.Graph()
-        
-        for doc_id, doc in enumerate(documents):
+    # Build proximity index, every document is linked to the terms of its title, author and content,
+    # positions count the tokens of the three in that order
+    def build_proximity_index(self, documents):
+        document_tokens = []
+        for doc in documents:
             title_nodes = self.preprocess_text(doc['title'])
             author_nodes = self.preprocess_text(doc['author'])
             content_nodes = self.preprocess_text(doc['content'])
-            all_nodes = set(title_nodes + author_nodes + content_nodes)
+            document_tokens.append(title_nodes + author_nodes + content_nodes)
 
-            # Add document and related nodes to the graph
-            graph.add_node(doc_id, type="document", title=doc['title'])
-            for node in all_nodes:
-                graph.add_node(node, type="term")
-                graph.add_edge(doc_id, node)
-        
-        return graph
+        return ProximityIndex(document_tokens)
     
-    # Fuzzy matching for related terms
-    def get_related_terms(self, query_term, graph, threshold=0.6):
-        all_terms = [node for node, attrs in graph.nodes(data=True) if attrs.get('type') == 'term']
-        related_terms = difflib.get_close_matches(query_term, all_terms, n=5, cutoff=threshold)
+    # Fuzzy matching for related terms, the deletion index narrows the vocabulary down to the terms within
+    # MAX_EDIT_DISTANCE edits before difflib ranks them
+    def get_related_terms(self, query_term, proximity_index, threshold=0.6):
+        related_terms = difflib.get_close_matches(query_term, self.fuzzy_index.lookup(query_term), n=5, cutoff=threshold)
         return related_terms
     
-    # Proximal Nodes Model Search
-    def proximal_nodes_search(self, query, graph, documents):
-        query_nodes = self.preprocess_text(query)
-        proximal_nodes = set()
-
-        for node in query_nodes:
-            # Add exact matches
-            if node in graph:
-                proximal_nodes.update(nx.neighbors(graph, node))
-            
-            # Add fuzzy matches
-            related_terms = self.get_related_terms(node, graph)
-            for related_node in related_terms:
-                if related_node in graph:
-                    proximal_nodes.update(nx.neighbors(graph, related_node))
-
-        # Fetch documents connected to the proximal nodes
-        connected_docs = {node for node in proximal_nodes if graph.nodes[node].get('type') == 'document'}
+    # Function to rank the documents of the proximal nodes of the query. Every query term stands for itself
+    # and its fuzzy matches. Documents matching more query terms come first, then the ones where those terms
+    # sit in a shorter window (matched terms / window length), then doc id order.
+    def rank_proximal_documents(self, query, proximity_index, top_k=None):
+        term_groups = []
+        for node in dict.fromkeys(self.preprocess_text(query)):
+            # Exact match and fuzzy matches
+            related_terms = self.get_related_terms(node, proximity_index)
+            term_groups.append(dict.fromkeys(([node] if node in proximity_index else []) + related_terms))
+
+        # doc_id -> {query term: edges of its matching terms in the document}
+        doc_edges = defaultdict(lambda: defaultdict(list))
+        for group_id, terms in enumerate(term_groups):
+            for term in terms:
+                for doc_id, edge in proximity_index.term_edges(term):
+                    doc_edges[doc_id][group_id].append(edge)
+
+        ranked_docs = []
+        for doc_id, group_edges in doc_edges.items():
+            matched = len(group_edges)
+            proximity = 0
+            if matched > 1:
+                # Positions are only decoded for documents holding several query terms
+                position_lists = [
+                    list(heapq.merge(*(proximity_index.term_positions(edge) for edge in edges)))
+                    for edges in group_edges.values()
+                ]
+                proximity = matched / minimal_window(position_lists)
+            ranked_docs.append((-matched, -proximity, doc_id))
+
+        if top_k is not None:
+            # Bounded heap, same order as the full sort for the first k
+            ranked_docs = heapq.nsmallest(top_k, ranked_docs)
+        else:
+            ranked_docs.sort()
+        return [doc_id for _, _, doc_id in ranked_docs]
+
+    # Proximal Nodes Model Search, only the requested page gets its snippets built
+    def proximal_nodes_search(self, query, proximity_index, documents, offset=0, limit=None):
+        top_k = offset + limit if limit is not None else None
         results = []
 
-        for doc_id in connected_docs:
+        for doc_id in self.rank_proximal_documents(query, proximity_index, top_k)[offset:]:
             doc = documents[doc_id]
             snippet = f"{doc['content'][:180].rsplit(' ', 1)[0]}..." if len(doc['content']) > 100 else doc['content']
             results.append({'title': doc['title'], 'author': doc['author'], 'snippet': snippet.replace("Abstract", ""), 'file_path': doc['file_name']})
@@ -126,11 +559,13 @@ class SearchEngine():
 
     def suggest_keywords(self, input_text):
         input_text = input_text.lower()
-        all_terms = self.search_terms.keys()
-        
-        # Fuzzy match and prefix match
-        prefix_matches = [term for term in all_terms if term.startswith(input_text)]
-        fuzzy_matches = difflib.get_close_matches(input_text, all_terms, n=5, cutoff=0.6)
+
+        # Fuzzy match and prefix match, only the 5 most frequent prefix matches can make the final cut.
+        # Vocabulary terms are single words, so the fuzzy match looks at the word being typed.
+        prefix_matches = self.suggestion_trie.suggest(input_text, max_suggestions=5)
+        words = input_text.split()
+        last_word = words[-1] if words else input_text
+        fuzzy_matches = difflib.get_close_matches(last_word, self.fuzzy_index.lookup(last_word), n=5, cutoff=0.6)
         
         # Combine results, prioritize prefix matches
         suggestions = list(set(prefix_matches + fuzzy_matches))
@@ -140,7 +575,19 @@ class SearchEngine():
 
 
 
-search_engine = SearchEngine('Documents')
+# Worker processes of the extraction pool import this module too, only the main process builds the index
+search_engine = SearchEngine('Documents') if multiprocessing.parent_process() is None else None
+
+# Function to read the optional offset and limit (or k) parameters of a search, every search returns a bounded
+# page so only the top offset + limit documents are ranked in full
+def requested_page():
+    offset = int(request.args.get('offset', 0))
+    limit = int(request.args.get('k', request.args.get('limit', DEFAULT_PAGE_SIZE)))
+
+    if offset < 0 or not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"offset {offset} or limit {limit} out of range")
+    return offset, limit
+
 
 @app.route('/api/v5/suggestions', methods=['GET'])
 def suggestions():
@@ -157,7 +604,12 @@ def search():
     if not query:
         return jsonify({"error": "Query parameter is required"}), 400
 
-    results = search_engine.proximal_nodes_search(query, search_engine.graph, search_engine.documents)
+    try:
+        offset, limit = requested_page()
+    except ValueError:
+        return jsonify({"error": f"offset must be 0 or more and limit between 1 and {MAX_PAGE_SIZE}"}), 400
+
+    results = search_engine.proximal_nodes_search(query, search_engine.proximity_index, search_engine.documents, offset, limit)
     return jsonify({"results": results})
 
 
@@ -1,32 +1,506 @@
 import os
 import string
+import pickle
+import hashlib
+import multiprocessing
+import heapq
+import threading
+from math import log, isfinite
 from docx import Document
+from concurrent.futures import ProcessPoolExecutor
 from difflib import SequenceMatcher
-from collections import defaultdict
+from array import array
+from bisect import bisect_left
+from collections import defaultdict, Counter, OrderedDict
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 
 
 app = Flask(__name__)
 CORS(app)
 
+# Width of one term id inside a packed phrase key, enough for vocabularies of up to 4 billion terms.
+PHRASE_ID_BITS = 32
+
+# Phrases seen fewer times than this are pruned from the suggestion terms.
+MIN_PHRASE_COUNT = 2
+
+# Bump whenever the layout of the pickled index changes, older snapshots are then rebuilt from the documents.
+SNAPSHOT_VERSION = 3
+
+# Below this many files to parse, starting worker processes costs more than it saves.
+PARALLEL_EXTRACTION_THRESHOLD = 16
+
+# Page of results a search endpoint returns when no limit is given, and the largest one it returns for one request.
+DEFAULT_PAGE_SIZE = 10
+MAX_PAGE_SIZE = 100
+
+# BM25 term frequency saturation of the combined search.
+BM25_K1 = 1.2
+
+# BM25F boost and length normalisation (b) of every field in the combined search.
+BM25F_FIELDS = {'title': (3.0, 0.5), 'author': (2.0, 0.5), 'content': (1.0, 0.75)}
+
+# How many parsed articles /api/v6/article/extract keeps in memory.
+ARTICLE_CACHE_SIZE = 64
+
+# How many (query term, threshold) pairs keep their partial matches cached, per set of membership degrees.
+PARTIAL_MATCH_CACHE_SIZE = 4096
+
+
+
+# Function to extract doc_data from specific docx file
+def extract_text_from_documents(file_path):
+    document = Document(file_path)
+    doc_data = {'title': "", 'author': "", "content": ""}
+
+    paragraphs = (p.text.strip() for p in document.paragraphs if p.text.strip())
+    for text in paragraphs:
+        if not doc_data['title']:
+            doc_data['title'] = text
+        elif text.startswith("Author:"):
+            doc_data['author'] = text[7:].strip()
+        else:
+            doc_data['content'] += f" {text}"
+
+    return doc_data
+
+
+# Process pool worker, kept at module level so it can be sent to the worker processes.
+# A broken file comes back as an error message instead of aborting the whole extraction.
+def extract_document(file_path):
+    try:
+        return extract_text_from_documents(file_path), None
+    except Exception as e:
+        return None, str(e)
+
+
+# Postings of one term: sorted doc ids and their term frequencies in two parallel typed arrays, about
+# 6 bytes per posting. Reads follow the dict interface ({doc_id: tf}) the scoring functions already use.
+class Postings:
+    __slots__ = ('doc_ids', 'tfs')
+
+    def __init__(self):
+        self.doc_ids = array('I')
+        self.tfs = array('H')
+
+    # Counts an occurrence while building, doc ids have to arrive in increasing order
+    def add(self, doc_id, count=1):
+        if self.doc_ids and self.doc_ids[-1] == doc_id:
+            self.set_tf(len(self.tfs) - 1, self.tfs[-1] + count)
+        else:
+            self.doc_ids.append(doc_id)
+            self.tfs.append(0)
+            self.set_tf(len(self.tfs) - 1, count)
+
+    # Widens the frequencies to 32 bits the first time one does not fit in 16
+    def set_tf(self, position, tf):
+        if tf > 0xFFFF and self.tfs.typecode == 'H':
+            self.tfs = array('I', self.tfs)
+        self.tfs[position] = tf
+
+    def find(self, doc_id):
+        position = bisect_left(self.doc_ids, doc_id)
+        if position < len(self.doc_ids) and self.doc_ids[position] == doc_id:
+            return position
+        return -1
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    def __contains__(self, doc_id):
+        return self.find(doc_id) >= 0
+
+    def __getitem__(self, doc_id):
+        position = self.find(doc_id)
+        if position < 0:
+            raise KeyError(doc_id)
+        return self.tfs[position]
+
+    def get(self, doc_id, default=None):
+        position = self.find(doc_id)
+        return self.tfs[position] if position >= 0 else default
+
+    def keys(self):
+        return self.doc_ids
+
+    def values(self):
+        return self.tfs
+
+    def items(self):
+        return zip(self.doc_ids, self.tfs)
+
+    # On-disk form: (doc id gap, tf) pairs as LEB128 varints
+    def to_bytes(self):
+        data = bytearray()
+        previous = 0
+        for doc_id, tf in zip(self.doc_ids, self.tfs):
+            for value in (doc_id - previous, tf):
+                while value >= 0x80:
+                    data.append((value & 0x7F) | 0x80)
+                    value >>= 7
+                data.append(value)
+            previous = doc_id
+        return bytes(data)
+
+    @classmethod
+    def from_bytes(cls, data):
+        postings = cls()
+        values = []
+        value = shift = 0
+        for byte in data:
+            value |= (byte & 0x7F) << shift
+            if byte & 0x80:
+                shift += 7
+                continue
+            values.append(value)
+            value = shift = 0
+
+        doc_id = 0
+        for position in range(0, len(values), 2):
+            doc_id += values[position]
+            postings.doc_ids.append(doc_id)
+            postings.tfs.append(0)
+            postings.set_tf(len(postings.tfs) - 1, values[position + 1])
+        return postings
+
+
+# Compressed prefix trie over the suggestion terms. Every node caches its top-k terms by frequency,
+# so a lookup only walks the prefix and returns the cached list instead of scanning the vocabulary.
+class SuggestionTrie:
+    def __init__(self, search_terms, top_k=10):
+        self.top_k = top_k
+        self.search_terms = search_terms
+        self.rank = {term: rank for rank, term in enumerate(search_terms)}
+        self.root = self.build_node(sorted(search_terms), 0, len(search_terms), 0)
+
+    def sort_key(self, term):
+        return (-self.search_terms[term], self.rank[term])
+
+    # Builds the node for the sorted terms[lo:hi], which all share their first `depth` characters
+    def build_node(self, terms, lo, hi, depth):
+        node = {'label': "", 'children': {}, 'top': []}
+        if lo >= hi:
+            return node
+
+        first, last = terms[lo], terms[hi - 1]
+        end = depth
+        while end < min(len(first), len(last)) and first[end] == last[end]:
+            end += 1
+        node['label'] = first[depth:end]
+
+        candidates = []
+        if len(first) == end:
+            candidates.append(first)
+            lo += 1
+
+        while lo < hi:
+            char = terms[lo][end]
+            child_hi = lo + 1
+            while child_hi < hi and terms[child_hi][end] == char:
+                child_hi += 1
+            child = self.build_node(terms, lo, child_hi, end)
+            node['children'][char] = child
+            candidates.extend(child['top'])
+            lo = child_hi
+
+        node['top'] = sorted(candidates, key=self.sort_key)[:self.top_k]
+        return node
+
+    # Function to return the most frequent terms starting with the prefix
+    def suggest(self, prefix, max_suggestions=5):
+        node = self.root
+        position = 0
+
+        while True:
+            label = node['label']
+            remaining = prefix[position:]
+            if remaining.startswith(label) or label.startswith(remaining):
+                position += len(label)
+            else:
+                return []
+
+            if position >= len(prefix):
+                return node['top'][:max_suggestions]
+
+            node = node['children'].get(prefix[position])
+            if node is None:
+                return []
+
+
+
+# Membership postings of one term: doc ids and their membership degrees in two typed arrays, sorted by
+# descending membership (ties by doc id). The postings passing a threshold are always a prefix, found by
+# binary search, so a higher threshold reads fewer postings instead of testing every one of them.
+# Memberships are tf / max_tf, max_tf is kept so the term frequencies can be read back for BM25F.
+class MembershipPostings:
+    __slots__ = ('doc_ids', 'memberships', 'max_tf')
+
+    def __init__(self, doc_ids=(), memberships=(), max_tf=1):
+        self.doc_ids = array('I', doc_ids)
+        self.memberships = array('d', memberships)
+        self.max_tf = max_tf
+
+    @classmethod
+    def from_memberships(cls, memberships, max_tf=1):
+        ranked = sorted(memberships.items(), key=lambda x: (-x[1], x[0]))
+        return cls((doc_id for doc_id, _ in ranked), (membership for _, membership in ranked), max_tf)
+
+    # Function to return how many leading postings have membership * scale >= threshold
+    def cutoff(self, threshold, scale=1.0):
+        lo, hi = 0, len(self.memberships)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.memberships[mid] * scale >= threshold:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    def items(self):
+        return zip(self.doc_ids, self.memberships)
+
+    # Function to return (doc_id, tf) pairs, rounding undoes the division by max_tf exactly
+    def term_frequencies(self):
+        return ((doc_id, round(membership * self.max_tf)) for doc_id, membership in self.items())
+
+    # On-disk form: the raw bytes of both arrays and max_tf
+    def to_bytes(self):
+        return self.doc_ids.tobytes(), self.memberships.tobytes(), self.max_tf
+
+    @classmethod
+    def from_bytes(cls, data):
+        postings = cls(max_tf=data[2])
+        postings.doc_ids.frombytes(data[0])
+        postings.memberships.frombytes(data[1])
+        return postings
+
+
+# Character inverted lists over the terms of a set of membership degrees, for the partial matches of unknown
+# query terms. SequenceMatcher's ratio is 2 * M / (len(a) + len(b)), and M (the matched characters) can not exceed
+# the characters both terms share counted with multiplicity. The lists add that overlap up for every term sharing
+# a character with the query term, so only terms whose bound reaches the threshold get the exact ratio and no
+# match is lost. Results are cached per (query term, threshold), least recently used first.
+class PartialMatchIndex:
+    def __init__(self, terms, cache_size=PARTIAL_MATCH_CACHE_SIZE):
+        self.terms = list(terms)
+        self.char_postings = {}
+        for term_id, term in enumerate(self.terms):
+            for char, count in Counter(term).items():
+                term_ids, counts = self.char_postings.setdefault(char, (array('I'), array('I')))
+                term_ids.append(term_id)
+                counts.append(count)
+
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+
+    # Function to return {term: similarity} for the terms at least threshold similar to the query term
+    def find(self, query_term, threshold):
+        key = (query_term, threshold)
+        with self.lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                return self.cache[key]
+
+        matches = self.compute_matches(query_term, threshold)
+
+        with self.lock:
+            self.cache[key] = matches
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return matches
+
+    def compute_matches(self, query_term, threshold):
+        if threshold <= 0:
+            # Every term qualifies, even the ones without a single shared character
+            candidates = range(len(self.terms))
+        else:
+            overlap = defaultdict(int)
+            for char, query_count in Counter(query_term).items():
+                term_ids, counts = self.char_postings.get(char, ((), ()))
+                for term_id, count in zip(term_ids, counts):
+                    overlap[term_id] += min(query_count, count)
+
+            # Same formula as the ratio itself, so the bound never rounds below an exact match. Term id order keeps
+            # the matches in the order of the membership degrees, as the full scan did.
+            candidates = sorted(
+                term_id for term_id, shared in overlap.items()
+                if 2.0 * shared / (len(query_term) + len(self.terms[term_id])) >= threshold
+            )
+
+        matches = {}
+        for term_id in candidates:
+            term = self.terms[term_id]
+            similarity = SequenceMatcher(None, query_term, term).ratio()
+            if similarity >= threshold:
+                matches[term] = similarity
+        return matches
+
+
+# BM25F: the frequencies of a term in every field are length normalised per field and boosted, then BM25 saturates
+# their sum once per document. fields is a list of (membership_degrees, field_lengths, average_length, boost, b),
+# all keyed by the same doc ids. Returns {doc_id: score}.
+def bm25f_scores(query_terms, fields, num_documents, k1=BM25_K1):
+    scores = defaultdict(float)
+
+    for term, query_count in Counter(query_terms).items():
+        weighted_tfs = defaultdict(float)
+        for membership_degrees, field_lengths, average_length, boost, b in fields:
+            postings = membership_degrees.get(term)
+            if not postings or not boost:
+                continue
+            for doc_id, tf in postings.term_frequencies():
+                weighted_tfs[doc_id] += boost * tf / (1 - b + b * field_lengths[doc_id] / average_length)
+
+        # Documents containing the term in any field
+        doc_frequency = len(weighted_tfs)
+        idf = log(1 + (num_documents - doc_frequency + 0.5) / (doc_frequency + 0.5))
+        for doc_id, weighted_tf in weighted_tfs.items():
+            scores[doc_id] += query_count * idf * weighted_tf * (k1 + 1) / (k1 + weighted_tf)
+
+    return scores
 
 
 class SearchEngine:
-    def __init__(self, folder_path='Documents'):
+    def __init__(self, folder_path='Documents', snapshot_file='index_snapshot.pkl', extraction_workers=None, vectorized_scoring=None):
+        if vectorized_scoring and np is None:
+            raise ImportError("vectorized scoring needs numpy")
+
         self.folder_path = folder_path
+        self.snapshot_file = snapshot_file
+        self.extraction_workers = extraction_workers
+        self.extraction_errors = {}
         self.documents, self.search_terms, self.content_membership_degrees, self.title_membership_degrees, self.author_membership_degrees = self.setup_search_engine()
-
+        self.suggestion_trie = SuggestionTrie(self.search_terms)
+        self.content_lengths = self.compute_field_lengths(self.content_membership_degrees)
+        self.title_lengths = self.compute_field_lengths(self.title_membership_degrees)
+        self.author_lengths = self.compute_field_lengths(self.author_membership_degrees)
+        # Partial match indexes by id() of the membership degrees they were built from, built on first use
+        self.partial_match_indexes = {}
+        # None accumulates the scores in a NumPy buffer whenever NumPy is installed
+        self.vectorized_scoring = np is not None if vectorized_scoring is None else vectorized_scoring
+
+    # Function to load the indexes from the on-disk snapshot when the Documents folder did not change,
+    # otherwise only new and modified documents are parsed again before the indexes are rebuilt.
     def setup_search_engine(self):
-        extracted_documents = self.document_extractor()
+        snapshot = self.load_snapshot()
+        signatures = self.document_signatures(snapshot.get('signatures', {}))
+
+        if self.snapshot_is_current(snapshot, signatures):
+            index = self.decode_snapshot_index(snapshot['index'])
+        else:
+            index = self.build_search_index(self.document_extractor(self.cached_documents(snapshot, signatures)))
+
+        # Files that failed to extract stay out of the snapshot, so they are retried on the next start
+        for file_name in self.extraction_errors:
+            signatures.pop(file_name, None)
+
+        if snapshot.get('signatures') != signatures:
+            self.save_snapshot(signatures, index[0], self.encode_snapshot_index(index))
+
+        return index
+
+    # Function to load the index snapshot written by a previous start, an empty dict when there is no usable one
+    def load_snapshot(self):
+        try:
+            with open(self.snapshot_file, 'rb') as f:
+                snapshot = pickle.load(f)
+        except Exception:
+            return {}
+
+        if not isinstance(snapshot, dict) or snapshot.get('version') != SNAPSHOT_VERSION:
+            return {}
+        return snapshot
+
+    # Function to fingerprint every document by size, mtime and content hash. The hash is only recomputed
+    # for files whose size or mtime moved since the previous snapshot.
+    def document_signatures(self, previous_signatures):
+        signatures = {}
+
+        for file_name in os.listdir(self.folder_path):
+            file_path = os.path.join(self.folder_path, file_name)
+
+            if not (os.path.isfile(file_path) and file_name.endswith('.docx')):
+                continue
+
+            stat = os.stat(file_path)
+            previous = previous_signatures.get(file_name)
+            if previous and previous['size'] == stat.st_size and previous['mtime'] == stat.st_mtime_ns:
+                signatures[file_name] = previous
+            else:
+                signatures[file_name] = {'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'hash': self.file_hash(file_path)}
+
+        return signatures
+
+    def file_hash(self, file_path):
+        digest = hashlib.sha1()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    # The snapshot index can be reused as is when the same files are there with the same content
+    def snapshot_is_current(self, snapshot, signatures):
+        previous_signatures = snapshot.get('signatures')
+        if previous_signatures is None or previous_signatures.keys() != signatures.keys():
+            return False
+        return all(previous_signatures[name]['hash'] == signature['hash'] for name, signature in signatures.items())
+
+    # Function to return the extracted documents of the snapshot whose file did not change, so only
+    # new and modified files go through python-docx again.
+    def cached_documents(self, snapshot, signatures):
+        previous_signatures = snapshot.get('signatures', {})
+        return {
+            file_name: doc for file_name, doc in snapshot.get('documents', {}).items()
+            if file_name in signatures and previous_signatures[file_name]['hash'] == signatures[file_name]['hash']
+        }
+
+    def save_snapshot(self, signatures, documents, index):
+        snapshot = {
+            'version': SNAPSHOT_VERSION,
+            'signatures': signatures,
+            'documents': {os.path.basename(doc['file_name']): doc for doc in documents},
+            'index': index
+        }
+
+        temp_file = f"{self.snapshot_file}.tmp"
+        try:
+            with open(temp_file, 'wb') as f:
+                pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_file, self.snapshot_file)
+        except (OSError, pickle.PicklingError) as e:
+            print(f"Error: could not write the index snapshot: {e}")
+
+    # The snapshot keeps the membership postings as the raw bytes of their arrays
+    def encode_snapshot_index(self, index):
+        documents, search_terms, *membership_degrees = index
+        encode = lambda degrees: {term: postings.to_bytes() for term, postings in degrees.items()}
+        return (documents, search_terms, *(encode(degrees) for degrees in membership_degrees))
+
+    def decode_snapshot_index(self, index):
+        documents, search_terms, *membership_degrees = index
+        decode = lambda degrees: {term: MembershipPostings.from_bytes(data) for term, data in degrees.items()}
+        return (documents, search_terms, *(decode(degrees) for degrees in membership_degrees))
+
+    # Builds every index from the extracted documents, this tuple is what the snapshot stores
+    def build_search_index(self, extracted_documents):
         extracted_content = self.extract_fullContext_from_documents(extracted_documents)
         extracted_titles = self.extract_titles_from_documents(extracted_documents)
         extracted_authors = self.extract_author_from_documents(extracted_documents)
         
         content_index, search_terms = self.build_index(extracted_content)
-        title_index, _ = self.build_index(extracted_titles)
-        author_index, _ = self.build_index(extracted_authors)
+        title_index, _ = self.build_index(extracted_titles, count_phrases=False)
+        author_index, _ = self.build_index(extracted_authors, count_phrases=False)
 
         content_membership_degrees = self.calculate_fuzzy_membership(content_index)
         title_membership_degrees = self.calculate_fuzzy_membership(title_index)
@@ -34,34 +508,46 @@ class SearchEngine:
 
         return extracted_documents, search_terms, content_membership_degrees, title_membership_degrees, author_membership_degrees
 
-    def extract_text_from_documents(self, file_path):
-        document = Document(file_path)
-        doc_data = {'title': "", 'author': "", "content": ""}
-
-        paragraphs = (p.text.strip() for p in document.paragraphs if p.text.strip())
-        for text in paragraphs:
-            if not doc_data['title']:
-                doc_data['title'] = text
-            elif text.startswith("Author:"):
-                doc_data['author'] = text[7:].strip()
-            else:
-                doc_data['content'] += f" {text}"
+    def document_extractor(self, cached_documents=None):
+        cached_documents = cached_documents or {}
+        documents = []
 
-        return doc_data
+        # Sorted, so doc ids do not depend on the order the filesystem lists the folder in
+        file_names = [
+            file_name for file_name in sorted(os.listdir(self.folder_path))
+            if os.path.isfile(os.path.join(self.folder_path, file_name)) and file_name.endswith('.docx')
+        ]
+        pending = [file_name for file_name in file_names if file_name not in cached_documents]
+        extracted = dict(zip(pending, self.extract_files([os.path.join(self.folder_path, file_name) for file_name in pending])))
 
-    def document_extractor(self):
-        documents = []
-        for file_name in os.listdir(self.folder_path):
+        self.extraction_errors = {}
+        for file_name in file_names:
             file_path = os.path.join(self.folder_path, file_name)
-            if not (os.path.isfile(file_path) and file_name.endswith('.docx')):
+
+            if file_name in cached_documents:
+                documents.append(cached_documents[file_name])
+                continue
+
+            doc_data, error = extracted[file_name]
+            if error is not None:
+                print(f"Error: could not extract {file_path}: {error}")
+                self.extraction_errors[file_name] = error
                 continue
 
-            doc_data = self.extract_text_from_documents(file_path)
             doc_data['file_name'] = file_name
             documents.append(doc_data)
 
         return documents
 
+    # Function to parse the given files in order, fanned out over a process pool when there are enough of them
+    def extract_files(self, file_paths):
+        workers = self.extraction_workers or os.cpu_count() or 1
+        if workers < 2 or len(file_paths) < PARALLEL_EXTRACTION_THRESHOLD:
+            return [extract_document(file_path) for file_path in file_paths]
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(extract_document, file_paths, chunksize=max(1, len(file_paths) // (workers * 4))))
+
     def extract_fullContext_from_documents(self, documents):
         return [
             f"Title: {doc['title']}\nAuthor: {doc['author']}\nContent: {doc['content']}"
@@ -69,73 +555,141 @@ class SearchEngine:
         ]
 
     def extract_titles_from_documents(self, documents):
-        return [doc['title'] for doc in documents if doc.get('title')]
+        return [doc['title'] for doc in documents]
 
     def extract_author_from_documents(self, documents):
-        return [doc['author'] for doc in documents if doc.get('author')]
+        return [doc['author'] for doc in documents]
 
     def preprocess_text(self, text):
         stopwords = {"the", "and", "is", "in", "to", "of", "on", "for", "with", "a", "an", "as", "by", "this", "it", "at", "or", "that"}
         translator = str.maketrans('', '', string.punctuation)
         return [word for word in text.lower().translate(translator).split() if word not in stopwords]
 
-    def build_index(self, documents):
-        index = defaultdict(lambda: {'doc_ids': [], 'tf': {}})
-        search_terms = defaultdict(int)
+    def build_index(self, documents, count_phrases=True):
+        index = defaultdict(Postings)
+        term_ids = {}
+        phrase_counts = Counter()
 
         for doc_id, content in enumerate(documents):
             words = self.preprocess_text(content)
 
-            for i in range(len(words)):
-                word = words[i]
-                if doc_id not in index[word]['tf']:
-                    index[word]['tf'][doc_id] = 0
-                index[word]['tf'][doc_id] += 1
-                search_terms[word] += 1
-
-                for j in range(i + 1, min(i + 5, len(words) + 1)):
-                    phrase = " ".join(words[i:j])
-                    search_terms[phrase] += 1
+            for word in words:
+                index[word].add(doc_id)
 
-                index[word]['doc_ids'].append(doc_id)
+            if count_phrases:
+                self.count_phrases(words, term_ids, phrase_counts)
 
+        search_terms = self.build_search_terms(term_ids, phrase_counts)
         return index, search_terms
 
+    # Counts the 1 to 4 word phrases of a document under packed integer keys (one term id per PHRASE_ID_BITS),
+    # so no phrase string is built while counting.
+    def count_phrases(self, words, term_ids, phrase_counts):
+        ids = [term_ids.setdefault(word, len(term_ids) + 1) for word in words]
+
+        for i in range(len(ids)):
+            # Single words get counted once more on their own, which keeps them ahead of equally frequent phrases
+            phrase_counts[ids[i]] += 1
+
+            key = 0
+            for n in range(min(4, len(ids) - i)):
+                key |= ids[i + n] << (PHRASE_ID_BITS * n)
+                phrase_counts[key] += 1
+
+    # Function to prune the counted phrases and turn the survivors into search terms for suggestion purpose.
+    # Single words are always kept, phrases need min_count occurrences and at most max_phrases of them are kept.
+    def build_search_terms(self, term_ids, phrase_counts, min_count=MIN_PHRASE_COUNT, max_phrases=None):
+        words = [None] + list(term_ids)
+        mask = (1 << PHRASE_ID_BITS) - 1
+
+        phrases = [key for key, count in phrase_counts.items() if key > mask and count >= min_count]
+        if max_phrases is not None and len(phrases) > max_phrases:
+            phrases = set(heapq.nlargest(max_phrases, phrases, key=phrase_counts.get))
+        else:
+            phrases = set(phrases)
+
+        search_terms = defaultdict(int)
+        for key, count in phrase_counts.items():
+            if key > mask and key not in phrases:
+                continue
+
+            phrase = []
+            while key:
+                phrase.append(words[key & mask])
+                key >>= PHRASE_ID_BITS
+            search_terms[" ".join(phrase)] = count
+
+        return search_terms
+
     def calculate_similarity(self, term1, term2):
         return SequenceMatcher(None, term1, term2).ratio()
 
-    def find_partial_matches(self, query_term, terms, threshold=0.5):
-        matches = {}
-        for term in terms:
-            similarity = self.calculate_similarity(query_term, term)
-            if similarity >= threshold:
-                matches[term] = similarity
-        return matches
+    # Function to return {term: similarity} for the terms of the membership degrees at least threshold similar
+    # to the query term, through the character index instead of comparing it with every term
+    def find_partial_matches(self, query_term, membership_degrees, threshold=0.5):
+        partial_match_index = self.partial_match_indexes.get(id(membership_degrees))
+        if partial_match_index is None:
+            partial_match_index = self.partial_match_indexes[id(membership_degrees)] = PartialMatchIndex(membership_degrees.keys())
+        return partial_match_index.find(query_term, threshold)
 
+    # Function to turn the term frequencies into membership degrees, {term: MembershipPostings}
     def calculate_fuzzy_membership(self, index):
-        membership = defaultdict(lambda: defaultdict(float))
+        membership = {}
         for term, data in index.items():
-            max_tf = max(data['tf'].values()) if data['tf'] else 1
-            for doc_id, tf in data['tf'].items():
-                membership[term][doc_id] = tf / max_tf
+            max_tf = max(data.values()) if data else 1
+            membership[term] = MembershipPostings.from_memberships({doc_id: tf / max_tf for doc_id, tf in data.items()}, max_tf)
         return membership
 
+    # Function that computes the number of indexed words of every document in one field, from its postings
+    def compute_field_lengths(self, membership_degrees):
+        field_lengths = defaultdict(int)
+        for postings in membership_degrees.values():
+            for doc_id, tf in postings.term_frequencies():
+                field_lengths[doc_id] += tf
+        return dict(field_lengths)
+
+    # Function that ranks the documents against the title, author and content indexes in one pass with BM25F.
+    # Terms match exactly, boosts overrides the default boost of the fields it names.
+    def search_bm25f(self, query, boosts=None, offset=0, limit=None):
+        boosts = boosts or {}
+        num_documents = len(self.documents)
+
+        fields = []
+        for field, membership_degrees, field_lengths in (
+            ('title', self.title_membership_degrees, self.title_lengths),
+            ('author', self.author_membership_degrees, self.author_lengths),
+            ('content', self.content_membership_degrees, self.content_lengths)
+        ):
+            boost, b = BM25F_FIELDS[field]
+            average_length = sum(field_lengths.values()) / max(num_documents, 1)
+            fields.append((membership_degrees, field_lengths, average_length, boosts.get(field, boost), b))
+
+        scores = bm25f_scores(self.preprocess_text(query), fields, num_documents)
+        return self.rank_documents(scores, self.documents, offset, limit)
+
     def process_fuzzy_query(self, query, membership_degrees, fuzziness_threshold=0.30):
         query_terms = self.preprocess_text(query)
-        doc_scores = defaultdict(float)
         term_weights = {term: query_terms.count(term) for term in query_terms}
 
+        # (postings, weight, similarity) of every term the query reaches, similarity is None for exact matches
+        query_postings = []
         for term in query_terms:
             if term in membership_degrees:
-                for doc_id, membership in membership_degrees[term].items():
-                    if membership >= fuzziness_threshold:
-                        doc_scores[doc_id] += membership * term_weights[term]
+                query_postings.append((membership_degrees[term], term_weights[term], None))
             else:
-                partial_matches = self.find_partial_matches(term, membership_degrees.keys(), fuzziness_threshold)
+                partial_matches = self.find_partial_matches(term, membership_degrees, fuzziness_threshold)
                 for match_term, similarity in partial_matches.items():
-                    for doc_id, membership in membership_degrees[match_term].items():
-                        if membership * similarity >= fuzziness_threshold:
-                            doc_scores[doc_id] += membership * term_weights[term] * similarity
+                    query_postings.append((membership_degrees[match_term], term_weights[term], similarity))
+
+        if self.vectorized_scoring:
+            return self.accumulate_scores_vectorized(query_postings, fuzziness_threshold)
+
+        doc_scores = defaultdict(float)
+        for postings, weight, similarity in query_postings:
+            # Only the prefix of postings whose membership (times the similarity) passes the threshold
+            end = postings.cutoff(fuzziness_threshold, 1.0 if similarity is None else similarity)
+            for doc_id, membership in zip(postings.doc_ids[:end], postings.memberships[:end]):
+                doc_scores[doc_id] += membership * weight if similarity is None else membership * weight * similarity
 
         max_score = max(doc_scores.values()) if doc_scores else 1
         for doc_id in doc_scores:
@@ -143,11 +697,47 @@ class SearchEngine:
 
         return doc_scores
 
-
-    def rank_documents(self, doc_scores, documents):
-        ranked_docs = sorted(doc_scores.items(), key=lambda x: x[1], reverse=True)
+    # Same scores as process_fuzzy_query, added up in one NumPy buffer over the documents. The passing prefixes of
+    # all postings are gathered first, np.add.at then adds them in that order, so every document sums its terms
+    # in the same order as the loop does.
+    def accumulate_scores_vectorized(self, query_postings, fuzziness_threshold):
+        doc_ids = array('I')
+        memberships = array('d')
+        weights = []
+        similarities = []
+        lengths = []
+        for postings, weight, similarity in query_postings:
+            end = postings.cutoff(fuzziness_threshold, 1.0 if similarity is None else similarity)
+            doc_ids.extend(postings.doc_ids[:end])
+            memberships.extend(postings.memberships[:end])
+            weights.append(weight)
+            # Multiplying by 1.0 leaves the exact matches unchanged
+            similarities.append(1.0 if similarity is None else similarity)
+            lengths.append(end)
+
+        if not doc_ids:
+            return {}
+
+        doc_ids = np.frombuffer(doc_ids, dtype=np.uint32)
+        values = np.frombuffer(memberships, dtype=np.float64) * np.repeat(weights, lengths) * np.repeat(similarities, lengths)
+        scores = np.zeros(len(self.documents))
+        np.add.at(scores, doc_ids, values)
+
+        doc_ids = np.unique(doc_ids)
+        max_score = scores[doc_ids].max()
+        return dict(zip(doc_ids.tolist(), (scores[doc_ids] / max_score).tolist()))
+
+
+    # Only the requested page gets its snippets and result dicts built, best first and ties by doc id
+    def rank_documents(self, doc_scores, documents, offset=0, limit=None):
+        top_k = offset + limit if limit is not None else None
+        if top_k is not None:
+            # Bounded heap, same order as the full sort for the first k
+            ranked_docs = heapq.nsmallest(top_k, doc_scores.items(), key=lambda x: (-x[1], x[0]))
+        else:
+            ranked_docs = sorted(doc_scores.items(), key=lambda x: (-x[1], x[0]))
         result = []
-        for doc_id, score in ranked_docs:
+        for doc_id, score in ranked_docs[offset:]:
             doc = documents[doc_id]
             snippet = f"{doc['content'][:180].rsplit(' ', 1)[0]}..." if len(doc['content']) > 100 else doc['content']
             result.append({'title': doc['title'], 'author': doc['author'], 'snippet': snippet, 'score': score, 'file_path': doc['file_name']})
@@ -156,13 +746,12 @@ class SearchEngine:
 
     def suggest_keywords(self, input_text):
         input_text = input_text.lower()
-        suggestions = [term for term in self.search_terms if term.startswith(input_text)]
-        return sorted(suggestions, key=lambda x: self.search_terms[x], reverse=True)[:5]
+        return self.suggestion_trie.suggest(input_text, max_suggestions=5)
 
 
-    def search(self, query, membership_degrees, fuzziness_threshold):
+    def search(self, query, membership_degrees, fuzziness_threshold, offset=0, limit=None):
         doc_scores = self.process_fuzzy_query(query, membership_degrees, fuzziness_threshold)
-        results = self.rank_documents(doc_scores, self.documents)
+        results = self.rank_documents(doc_scores, self.documents, offset, limit)
         return results
     
 
@@ -240,9 +829,89 @@ def extract_docx_content(docx_file):
     return content
 
 
+# Parsed articles of /api/v6/article/extract, least recently used first. An entry is keyed by the path and only
+# served while the file keeps the mtime and size it was parsed with, so python-docx only runs for new or changed
+# files. Every article also gets a case-insensitive index of its section and subsection names.
+class ArticleStore:
+    def __init__(self, folder_path='Documents', cache_size=ARTICLE_CACHE_SIZE):
+        self.folder_path = folder_path
+        self.cache_size = cache_size
+        self.articles = OrderedDict()
+        self.lock = threading.Lock()
+
+    # Function to return the path of a file in the Documents folder, None for names reaching outside of it
+    def article_path(self, file_name):
+        if not file_name or os.path.basename(file_name) != file_name or file_name in ('.', '..'):
+            return None
+        return os.path.join(self.folder_path, file_name)
+
+    # Function to return the parsed article and its section index, (None, None) when the file does not exist
+    def get(self, file_name):
+        file_path = self.article_path(file_name)
+        if file_path is None or not os.path.isfile(file_path):
+            return None, None
+
+        stat = os.stat(file_path)
+        version = (stat.st_mtime_ns, stat.st_size)
+        with self.lock:
+            entry = self.articles.get(file_path)
+            if entry is not None and entry[0] == version:
+                self.articles.move_to_end(file_path)
+                return entry[1], entry[2]
+
+        article = extract_docx_content(file_path)
+        sections = self.build_section_index(article)
+
+        with self.lock:
+            self.articles[file_path] = (version, article, sections)
+            self.articles.move_to_end(file_path)
+            if len(self.articles) > self.cache_size:
+                self.articles.popitem(last=False)
+        return article, sections
+
+    # Function to map every lowercased section and subsection name to (section, subsection), the first one wins
+    def build_section_index(self, article):
+        sections = {}
+        for section, body in article["sections"].items():
+            sections.setdefault(section.lower(), (section, None))
+            if isinstance(body, dict):
+                for subsection in body:
+                    sections.setdefault(subsection.lower(), (section, subsection))
+        return sections
+
+    # Function to return one section (or subsection) of an article by name, None when it has no such section
+    def get_section(self, file_name, name):
+        article, sections = self.get(file_name)
+        if article is None or name.lower() not in sections:
+            return None
+
+        section, subsection = sections[name.lower()]
+        body = article["sections"][section]
+        return {
+            "title": article["title"],
+            "author": article["author"],
+            "section": subsection or section,
+            "parent": section if subsection else None,
+            "content": body[subsection] if subsection else body
+        }
+
+
 
 # Initialize the search engine once when the app starts
-search_engine = SearchEngine('Documents')
+# Worker processes of the extraction pool import this module too, only the main process builds the index
+search_engine = SearchEngine('Documents') if multiprocessing.parent_process() is None else None
+article_store = ArticleStore('Documents')
+
+# Function to read the optional offset and limit (or k) parameters of a search, every search returns a bounded
+# page so only the top offset + limit documents are ranked in full
+def requested_page():
+    offset = int(request.args.get('offset', 0))
+    limit = int(request.args.get('k', request.args.get('limit', DEFAULT_PAGE_SIZE)))
+
+    if offset < 0 or not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"offset {offset} or limit {limit} out of range")
+    return offset, limit
+
 
 @app.route('/api/suggestions', methods=['GET'])
 def suggestions():
@@ -262,7 +931,12 @@ def search_author():
     if not query:
         return jsonify({"error": "Query parameter is required"}), 400
 
-    results = search_engine.search(query, search_engine.author_membership_degrees, threshold)
+    try:
+        offset, limit = requested_page()
+    except ValueError:
+        return jsonify({"error": f"offset must be 0 or more and limit between 1 and {MAX_PAGE_SIZE}"}), 400
+
+    results = search_engine.search(query, search_engine.author_membership_degrees, threshold, offset, limit)
     return jsonify({"results": results})
 
 @app.route('/api/v6/search/title', methods=['GET'])
@@ -273,7 +947,12 @@ def search_title():
     if not query:
         return jsonify({"error": "Query parameter is required"}), 400
 
-    results = search_engine.search(query, search_engine.title_membership_degrees, threshold)
+    try:
+        offset, limit = requested_page()
+    except ValueError:
+        return jsonify({"error": f"offset must be 0 or more and limit between 1 and {MAX_PAGE_SIZE}"}), 400
+
+    results = search_engine.search(query, search_engine.title_membership_degrees, threshold, offset, limit)
     return jsonify({"results": results})
 
 @app.route('/api/v6/search/content', methods=['GET'])
@@ -284,7 +963,35 @@ def search_fulltext():
     if not query:
         return jsonify({"error": "Query parameter is required"}), 400
 
-    results = search_engine.search(query, search_engine.content_membership_degrees, threshold)
+    try:
+        offset, limit = requested_page()
+    except ValueError:
+        return jsonify({"error": f"offset must be 0 or more and limit between 1 and {MAX_PAGE_SIZE}"}), 400
+
+    results = search_engine.search(query, search_engine.content_membership_degrees, threshold, offset, limit)
+    return jsonify({"results": results})
+
+@app.route('/api/v6/search', methods=['GET'])
+def search_all_fields():
+    query = request.args.get('query', '')
+    if not query:
+        return jsonify({"error": "Query parameter is required"}), 400
+
+    try:
+        offset, limit = requested_page()
+    except ValueError:
+        return jsonify({"error": f"offset must be 0 or more and limit between 1 and {MAX_PAGE_SIZE}"}), 400
+
+    # Optional title_boost, author_boost and content_boost override the BM25F field boosts
+    try:
+        boosts = {field: float(request.args[f"{field}_boost"]) for field in BM25F_FIELDS if f"{field}_boost" in request.args}
+    except ValueError:
+        return jsonify({"error": "Field boosts must be numbers"}), 400
+    # float() also accepts nan and inf, which would turn every score into NaN or Infinity
+    if any(not isfinite(boost) or boost < 0 for boost in boosts.values()):
+        return jsonify({"error": "Field boosts must be finite numbers, 0 or more"}), 400
+
+    results = search_engine.search_bm25f(query, boosts, offset, limit)
     return jsonify({"results": results})
 
 @app.route('/api/v6/article/extract', methods=['GET'])
@@ -294,7 +1001,16 @@ def extract_content():
         if not query:
             return jsonify({"error": "Query parameter is required"}), 400
         
-        data = extract_docx_content('Documents/' + query)
+        data, _ = article_store.get(query)
+        if data is None:
+            return jsonify({"error": f"Document {query} not found"}), 404
+
+        # Only the named section when one is asked for, large papers do not have to be sent whole
+        section = request.args.get('section', '')
+        if section:
+            data = article_store.get_section(query, section)
+            if data is None:
+                return jsonify({"error": f"Section {section} not found in {query}"}), 404
         return jsonify(data), 200
     except Exception as e:
         return jsonify({"error" : str(e)}), 500
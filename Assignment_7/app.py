@@ -1,5 +1,6 @@
 import os
-from collections import defaultdict
+import threading
+from collections import defaultdict, deque
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 
@@ -42,28 +43,99 @@ def document_extractor(folder_path):
 
     return documents
 
-# Function to create links based on document titles
+# Function to build an Aho-Corasick automaton over the lowercased titles: the trie transitions of every state,
+# its failure link (the state of its longest proper suffix that is also in the trie) and the titles it completes
+def build_title_automaton(titles):
+    transitions = [{}]
+    failure = [0]
+    output = [[]]
+
+    for title in titles:
+        state = 0
+        for char in title.lower():
+            if char not in transitions[state]:
+                transitions.append({})
+                failure.append(0)
+                output.append([])
+                transitions[state][char] = len(transitions) - 1
+            state = transitions[state][char]
+        output[state].append(title)
+
+    # Breadth first, so the failure link of a state is always set before the states below it need it
+    queue = deque(transitions[0].values())
+    while queue:
+        state = queue.popleft()
+        for char, next_state in transitions[state].items():
+            queue.append(next_state)
+            fallback = failure[state]
+            while fallback and char not in transitions[fallback]:
+                fallback = failure[fallback]
+            failure[next_state] = transitions[fallback].get(char, 0)
+            output[next_state] = output[next_state] + output[failure[next_state]]
+
+    return transitions, failure, output
+
+# Function to return the set of titles found in the text, one pass over the lowercased text
+def find_titles(automaton, text):
+    transitions, failure, output = automaton
+    found = set(output[0])
+    state = 0
+
+    for char in text.lower():
+        while state and char not in transitions[state]:
+            state = failure[state]
+        state = transitions[state].get(char, 0)
+        if output[state]:
+            found.update(output[state])
+
+    return found
+
+# Function to create links based on document titles, a document links to every other document whose title
+# appears in its text (case-insensitive). Every text is scanned once for all titles at the same time.
 def create_hypertext_links(documents):
     links = defaultdict(list)
+    automaton = build_title_automaton(doc['title'] for doc in documents)
+    order = {}
+    for position, doc in enumerate(documents):
+        order.setdefault(doc['title'], position)
 
     for source_doc in documents:
         source_title = source_doc['title']
-        for target_doc in documents:
-            if source_doc == target_doc:
-                continue
-
-            target_title = target_doc['title']
-            if target_title.lower() in source_doc['text'].lower():  # Check if target title is in source text
-                if target_title not in links[source_title]:
-                    links[source_title].append(target_title)
+        # Targets in document order, the way the pairwise comparison listed them
+        for target_title in sorted(find_titles(automaton, source_doc['text']), key=order.get):
+            if target_title != source_title and target_title not in links[source_title]:
+                links[source_title].append(target_title)
 
     return links
 
+# Function to fingerprint the text files of the folder by name, mtime and size
+def folder_signature(folder_path):
+    signature = []
+    for file_name in os.listdir(folder_path):
+        file_path = os.path.join(folder_path, file_name)
+        if os.path.isfile(file_path) and file_name.endswith('.txt'):
+            stat = os.stat(file_path)
+            signature.append((file_name, stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+# The documents and their link graph, rebuilt only when a text file of the folder was added, removed or changed
+link_graph_cache = {'signature': None, 'documents': [], 'links': {}}
+link_graph_lock = threading.Lock()
+
+# Function to return the documents of the folder and their links, from the cache while no file changed
+def get_link_graph(folder_path):
+    signature = folder_signature(folder_path)
+    with link_graph_lock:
+        if link_graph_cache['signature'] != signature:
+            documents = document_extractor(folder_path)
+            link_graph_cache.update(signature=signature, documents=documents, links=create_hypertext_links(documents))
+        return link_graph_cache['documents'], link_graph_cache['links']
+
 
 @app.route('/api/v7/content', methods=['GET'])
 def get_documents():
-    documents = document_extractor("Documents")
-    links = create_hypertext_links(documents)
+    documents, links = get_link_graph("Documents")
     return jsonify({"results": documents, "links": links})
 
 if __name__ == "__main__":